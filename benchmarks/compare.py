@@ -0,0 +1,55 @@
+"""Compares two benchmark result files from run.py.
+
+    python benchmarks/compare.py before.json after.json [--threshold 1.25]
+
+Exits with status 1 if a benchmark got slower than the threshold ratio.
+"""
+
+from typing import Any, Dict
+from pathlib import Path
+import argparse
+import json
+import sys
+
+
+def load(path: str) -> Dict[str, Any]:
+    return json.loads(Path(path).read_text(encoding="utf8"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=1.25)
+    args = parser.parse_args()
+
+    before = load(args.before)
+    after = load(args.after)
+    print(f"before: {before['meta'].get('commit')}  after: {after['meta'].get('commit')}")
+    regressions = []
+    for name, new in after["results"].items():
+        old = before["results"].get(name)
+        if old is None:
+            print(f"{name:<50} {'':>12} {new['median_s'] * 1e6:>12.1f} us  (new)")
+            continue
+        ratio = new["median_s"] / old["median_s"] if old["median_s"] else float("inf")
+        flag = ""
+        if ratio > args.threshold:
+            flag = "  SLOWER"
+            regressions.append(name)
+        elif ratio < 1 / args.threshold:
+            flag = "  faster"
+        print(
+            f"{name:<50} {old['median_s'] * 1e6:>12.1f} {new['median_s'] * 1e6:>12.1f} us"
+            f"  x{ratio:.2f}{flag}"
+        )
+    for name in before["results"]:
+        if name not in after["results"]:
+            print(f"{name:<50} (removed)")
+    if regressions:
+        print(f"{len(regressions)} benchmarks got slower than x{args.threshold}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Writes a page that times injecting the colors into a TS page, before and after the page runtime.
+
+    python benchmarks/inject_page.py -o inject_web.html
+
+Open the written file in a Chromium based browser, which is what Anki's webviews run on.
+Each trial loads a fresh page in an iframe and times evaluating the injection script,
+including the style recalculation it causes, then times a second injection into the same page.
+The legacy script appends style nodes with document.head.innerHTML +=, which re-parses the whole head,
+so the page head holds stand-ins for the stylesheets and scripts of Anki's pages.
+The results are shown in a table and kept in window.recolorBenchmark.
+
+The Python side of the injection is timed by run.py ("web.inject_web_ts").
+"""
+
+from typing import List
+from pathlib import Path
+import argparse
+import json
+import sys
+import tempfile
+
+import legacy
+from run import ADDON_MODULE, install_addon, load_addon
+
+
+def stand_in_head(stylesheet_kb: int) -> str:
+    "Stylesheets and scripts sized like those of Anki's pages"
+    rules: List[str] = []
+    i = 0
+    while sum(map(len, rules)) < stylesheet_kb * 1024:
+        rules.append(
+            f".rule-{i} > .child:hover {{ color: var(--fg); background: var(--canvas-elevated);"
+            f" border: 1px solid var(--border); margin: {i % 7}px; }}\n"
+        )
+        i += 1
+    half = len(rules) // 2
+    return (
+        "<meta charset='utf-8'>"
+        "<title>page</title>"
+        f"<style>{''.join(rules[:half])}</style>"
+        f"<style>{''.join(rules[half:])}</style>"
+        "<script>window.pageScript = 1</script>"
+        "<script>window.bridgeCommand = function () {}</script>"
+    )
+
+
+PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>ReColor injection benchmark</title>
+<style>
+body { font-family: sans-serif }
+iframe { width: 400px; height: 200px }
+td, th { padding: 2px 12px; text-align: right }
+</style></head>
+<body>
+<p id="status">Running...</p>
+<table id="results"></table>
+<script>
+const SCRIPTS = %(scripts)s
+const PAGE_HTML = %(page_html)s
+const TRIALS = %(trials)d
+
+function median (values) {
+  const sorted = values.slice().sort((a, b) => a - b)
+  return sorted[Math.floor(sorted.length / 2)]
+}
+
+function timeEval (win, script) {
+  const start = performance.now()
+  win.eval(script)
+  // Force the style recalculation the new css causes
+  void win.getComputedStyle(win.document.body).getPropertyValue('--canvas')
+  return performance.now() - start
+}
+
+async function trial (script) {
+  const frame = document.createElement('iframe')
+  const loaded = new Promise(resolve => { frame.onload = resolve })
+  frame.srcdoc = PAGE_HTML
+  document.body.appendChild(frame)
+  await loaded
+  const win = frame.contentWindow
+  void win.getComputedStyle(win.document.body).color
+  const first = timeEval(win, script)
+  const second = timeEval(win, script)
+  const styleNodes = win.document.querySelectorAll('style[id^=recolor-]').length
+  frame.remove()
+  return { first, second, styleNodes }
+}
+
+async function run () {
+  const samples = {}
+  for (const name in SCRIPTS) samples[name] = { first: [], second: [], styleNodes: 0 }
+  for (let i = 0; i < TRIALS; i++) {
+    // Alternate, so both see the same browser state
+    for (const name in SCRIPTS) {
+      const result = await trial(SCRIPTS[name])
+      samples[name].first.push(result.first)
+      samples[name].second.push(result.second)
+      samples[name].styleNodes = result.styleNodes
+    }
+  }
+  const results = {}
+  const table = document.getElementById('results')
+  table.innerHTML = '<tr><th>script</th><th>bytes</th><th>first injection (ms, median)</th>' +
+    '<th>second injection (ms, median)</th><th>recolor style nodes after two</th></tr>'
+  for (const name in SCRIPTS) {
+    results[name] = {
+      script_bytes: new Blob([SCRIPTS[name]]).size,
+      first_ms: median(samples[name].first),
+      second_ms: median(samples[name].second),
+      style_nodes: samples[name].styleNodes,
+      trials: TRIALS
+    }
+    const r = results[name]
+    const row = table.insertRow()
+    for (const value of [name, r.script_bytes, r.first_ms.toFixed(3), r.second_ms.toFixed(3), r.style_nodes]) {
+      row.insertCell().textContent = value
+    }
+  }
+  window.recolorBenchmark = results
+  document.getElementById('status').textContent = 'Done, ' + TRIALS + ' trials each.'
+  document.title = 'done'
+}
+
+run()
+</script>
+</body></html>
+"""
+
+
+def script_json(value: object) -> str:
+    "JSON that can be embedded in a <script> element"
+    return json.dumps(value).replace("<", "\\u003c")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-o", "--output", default="inject_web.html")
+    parser.add_argument("--trials", type=int, default=50)
+    parser.add_argument(
+        "--stylesheet-kb", type=int, default=60, help="size of the stand-in stylesheets in the page head"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="recolor-bench-") as tmp:
+        addons_dir = Path(tmp)
+        install_addon(addons_dir)
+        load_addon(addons_dir)
+        colors = sys.modules[f"{ADDON_MODULE}.colors"]
+
+        class Page:
+            script = ""
+
+            def eval(self, js: str) -> None:
+                self.script = js
+
+        page = Page()
+        colors.inject_web_ts(page)
+        scripts = {
+            "legacy (innerHTML +=)": legacy.inject_web_ts_js(*legacy.theme_css(colors.conf["colors"])),
+            "runtime (ReColor.update)": page.script,
+        }
+
+    page_html = (
+        f"<!doctype html><html><head>{stand_in_head(args.stylesheet_kb)}</head>"
+        "<body><div id='content'>Front<hr id=answer>Back</div></body></html>"
+    )
+    html = PAGE % {
+        "scripts": script_json(scripts),
+        "page_html": script_json(page_html),
+        "trials": args.trials,
+    }
+    Path(args.output).write_text(html, encoding="utf8")
+    for name, script in scripts.items():
+        print(f"{name:<30} {len(script.encode()):>8} bytes")
+    print(f"Saved to {args.output}, open it in a browser")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""The implementations the optimized code paths replaced, copied from before the changes.
+
+run.py times them next to the current code, so each optimization keeps its before/after numbers.
+They take their inputs as arguments instead of reading the add-on's globals.
+"""
+
+from typing import Any, Dict, Tuple
+import copy
+import re
+
+
+# Before "Inject TS page styles through stable style nodes"
+
+
+def theme_css(colors_config: Dict[str, Any]) -> Tuple[str, str, str]:
+    "get_theme_css(), which rebuilt the css from the config for every page"
+    light_mode_css = ""
+    dark_mode_css = ""
+    for name in colors_config:
+        entry = colors_config[name]
+        css_names = entry[3]
+        if not isinstance(css_names, list):
+            css_names = [css_names]
+        for css_name in css_names:
+            light_mode_css += f"{css_name}: {entry[1]};\n"
+            dark_mode_css += f"{css_name}: {entry[2]};\n"
+
+    extra_css = """
+html button {
+    background: var(--button-bg);
+}
+.night-mode .isMac button {
+    --canvas: %s;
+    --fg: %s;
+}
+""" % (
+        colors_config["BUTTON_BG"][2],
+        colors_config["FG"][2],
+    )
+
+    return (light_mode_css, dark_mode_css, extra_css)
+
+
+def inject_web_ts_js(light_mode_css: str, dark_mode_css: str, extra_css: str) -> str:
+    "The script inject_web_ts() evaluated, which appends the style nodes by re-parsing the page head"
+    styles = """
+    <style id='recolor-light'>body { \n%s }</style>
+    <style id='recolor-dark'>body.night_mode { \n%s }</style>
+    <style id='recolor-extra'>%s</style>
+    """ % (light_mode_css, dark_mode_css, extra_css)
+
+    return f"""(() => {{
+            document.head.innerHTML += `{styles}`;
+        }})()"""
+
+
+# Before "Return read-only views from ConfigManager.get and cache key paths"
+
+
+def config_get(config: Dict[str, Any], key: str, default: Any = None) -> Any:
+    "ConfigManager.get(), which split the key and deep copied the value on every call"
+    try:
+        levels = key.split(".")
+        return_val: Any = config
+        for level in levels:
+            if isinstance(return_val, list):
+                return_val = return_val[int(level)]
+            else:
+                return_val = return_val[level]
+        return copy.deepcopy(return_val)
+    except KeyError:
+        return default
+
+
+# Before "Add a memoized color parsing and conversion module"
+
+
+def hex_with_alpha_to_rgba(hex_color: str) -> str:
+    """Convert CSS's eight-value syntax to rgba to work with Qt stylesheets"""
+    if hex_color.startswith("#") and len(hex_color) == 9:
+        color = hex_color.strip("#")
+        red = int(color[0:2], 16)
+        green = int(color[2:4], 16)
+        blue = int(color[4:6], 16)
+        alpha = round(int(color[6:8], 16) / 255, 2)
+        return f"rgba({red}, {green}, {blue}, {alpha})"
+    return hex_color
+
+
+RGBA_RE = re.compile(r"\((\d+),\s*(\d+),\s*(\d+),\s*(\d+\.*\d+?)\)\s*")
+
+
+def hex_with_alpha_to_argb(hex_color: str) -> str:
+    if hex_color.startswith("#") and len(hex_color) == 9:
+        return "#" + hex_color[7:9] + hex_color[1:7]
+    elif hex_color.startswith("rgba") and (m := re.match(RGBA_RE, hex_color[4:])):
+        r = int(m.group(1))
+        g = int(m.group(2))
+        b = int(m.group(3))
+        a = int(255 * float(m.group(4)))
+        return f"#{a:02x}{r:02x}{g:02x}{b:02x}"
+    return hex_color
+
+
+# Before "Return the precomputed canvas QColor from get_window_bg_color"
+
+
+def window_bg_color(config: Dict[str, Any], night_mode: bool) -> Any:
+    "get_window_bg_color(), which looked the color up in the config and parsed a QColor for every webview"
+    from aqt.qt import QColor
+
+    color_idx = 2 if night_mode else 1
+    hex_color = config_get(config, f"colors.CANVAS.{color_idx}")
+    return QColor(hex_color)
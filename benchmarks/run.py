@@ -0,0 +1,568 @@
+"""Headless benchmarks of ReColor's hot paths.
+
+The add-on runs against the stub aqt/anki packages in ./stubs, with Qt on the offscreen platform.
+It is copied to a temporary addons folder first, so config saves and migrations don't touch the repo.
+
+    python benchmarks/run.py -o before.json
+    python benchmarks/run.py -o after.json
+    python benchmarks/compare.py before.json after.json
+
+Requires PyQt6.
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+from pathlib import Path
+import argparse
+import copy
+import datetime
+import importlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import legacy
+
+REPO_DIR = Path(__file__).resolve().parents[1]
+ADDON_SRC = REPO_DIR / "src" / "addon"
+STUBS_DIR = Path(__file__).resolve().parent / "stubs"
+# The add-on's package name in the temporary addons folder
+ADDON_MODULE = "recolor"
+
+WEBVIEW_COUNTS = (1, 10, 100, 500)
+
+
+class Results:
+    def __init__(self, quick: bool) -> None:
+        self.quick = quick
+        self.entries: Dict[str, Dict[str, Any]] = {}
+
+    def measure(
+        self,
+        name: str,
+        fn: Callable[[], Any],
+        setup: Optional[Callable[[], Any]] = None,
+        **params: Any,
+    ) -> None:
+        """Records the seconds per call of fn.
+
+        Without setup, calls are timed in batches like timeit.
+        With setup, every call is timed on its own, after running setup untimed.
+        """
+        min_time = 0.02 if self.quick else 0.2
+        repeat = 3 if self.quick else 7
+        samples: List[float] = []
+        if setup is None:
+            number = 1
+            while True:
+                start = time.perf_counter()
+                for _ in range(number):
+                    fn()
+                elapsed = time.perf_counter() - start
+                if elapsed >= min_time / repeat or number >= 1_000_000:
+                    break
+                number *= 10
+            samples.append(elapsed / number)
+            for _ in range(repeat - 1):
+                start = time.perf_counter()
+                for _ in range(number):
+                    fn()
+                samples.append((time.perf_counter() - start) / number)
+            runs = number * repeat
+        else:
+            total = 0.0
+            while len(samples) < repeat or (total < min_time and len(samples) < 1000):
+                setup()
+                start = time.perf_counter()
+                fn()
+                elapsed = time.perf_counter() - start
+                samples.append(elapsed)
+                total += elapsed
+            runs = len(samples)
+        self.entries[name] = {
+            "median_s": statistics.median(samples),
+            "min_s": min(samples),
+            "mean_s": statistics.mean(samples),
+            "runs": runs,
+            **params,
+        }
+        print(f"{name:<50} {statistics.median(samples) * 1e6:>12.1f} us")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=REPO_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def install_addon(addons_dir: Path) -> None:
+    shutil.copytree(
+        ADDON_SRC,
+        addons_dir / ADDON_MODULE,
+        ignore=shutil.ignore_patterns("__pycache__", "user_files", "meta.json"),
+    )
+
+
+def load_addon(addons_dir: Path) -> Any:
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    sys.path.insert(0, str(STUBS_DIR))
+    sys.path.insert(0, str(addons_dir))
+    import aqt
+
+    aqt.setup(addons_dir)
+    start = time.perf_counter()
+    addon = __import__(ADDON_MODULE)
+    return addon, time.perf_counter() - start
+
+
+def write_config(addons_dir: Path, config: Dict[str, Any]) -> None:
+    meta_path = addons_dir / ADDON_MODULE / "meta.json"
+    meta_path.write_text(json.dumps({"config": config}), encoding="utf8")
+
+
+def toggled(color_entries: Dict[str, Any], step: int) -> Dict[str, Any]:
+    "A copy with CANVAS changed, so every step has different colors"
+    colors = copy.deepcopy(color_entries)
+    colors["CANVAS"][1] = "#%06x" % (0x101010 + step % 2)
+    return colors
+
+
+# Benchmarks
+
+
+def bench_theme(res: Results, addon: Any) -> None:
+    colors = sys.modules[f"{ADDON_MODULE}.colors"]
+    compiler = sys.modules[f"{ADDON_MODULE}.compiler"]
+    from aqt.webview import WebContent
+
+    colors_config = colors.conf.get_copy("colors")
+    res.measure("theme.compile_theme", lambda: compiler.compile_theme(colors_config))
+    res.measure("theme.get_theme_css (compiled)", colors.get_theme_css)
+
+    def invalidate() -> None:
+        colors.invalidate_compiled_theme()
+
+    res.measure("theme.get_theme_css (invalidated)", colors.get_theme_css, setup=invalidate)
+
+    def inject() -> None:
+        colors.inject_web(WebContent(), None)
+
+    res.measure("web.inject_web", inject)
+
+
+def bench_inject_web_ts(res: Results, addon: Any) -> None:
+    """Python side of injecting the colors into a TS page, before and after the page runtime.
+    The script's cost in the page is measured by inject_page.py, in a browser."""
+    colors = sys.modules[f"{ADDON_MODULE}.colors"]
+    conf = colors.conf
+
+    class Page:
+        script = ""
+
+        def eval(self, js: str) -> None:
+            self.script = js
+
+    page = Page()
+
+    def legacy_inject() -> None:
+        # The config was read from disk on every call back then
+        conf.load(force=True)
+        page.eval(legacy.inject_web_ts_js(*legacy.theme_css(conf["colors"])))
+
+    legacy_inject()
+    res.measure("web.inject_web_ts (legacy)", legacy_inject, script_bytes=len(page.script.encode()))
+    colors.inject_web_ts(page)
+    res.measure(
+        "web.inject_web_ts",
+        lambda: colors.inject_web_ts(page),
+        script_bytes=len(page.script.encode()),
+    )
+
+
+def bench_recolor_python(res: Results, addon: Any) -> None:
+    colors = sys.modules[f"{ADDON_MODULE}.colors"]
+    conf = colors.conf
+    saved_colors = conf.get_copy("colors")
+
+    res.measure("qt.recolor_python (unchanged)", colors.recolor_python)
+    res.measure("qt.recolor_python (force)", lambda: colors.recolor_python(force=True))
+    steps = iter(range(10**9))
+
+    def change() -> None:
+        conf.set("colors", toggled(saved_colors, next(steps)))
+
+    res.measure("qt.recolor_python (changed)", colors.recolor_python, setup=change)
+    conf.set("colors", saved_colors)
+    colors.recolor_python()
+
+    from aqt.theme import theme_manager
+
+    res.measure("qt.get_window_bg_color", lambda: colors.get_window_bg_color(None))
+    res.measure(
+        "qt.get_window_bg_color (legacy)",
+        lambda: legacy.window_bg_color(conf._config, theme_manager.night_mode),
+    )
+
+    from aqt.qt import sip
+    from aqt.webview import AnkiWebView
+
+    # AnkiWebView.__init__ sets the page background to get_window_bg_color()
+    def create_webview(bg_color: Callable[[], Any]) -> None:
+        webview = AnkiWebView()
+        bg_color()
+        webview.cleanup()
+        sip.delete(webview)
+
+    res.measure(
+        "qt.webview creation",
+        lambda: create_webview(lambda: colors.get_window_bg_color(None)),
+    )
+    res.measure(
+        "qt.webview creation (legacy)",
+        lambda: create_webview(
+            lambda: legacy.window_bg_color(conf._config, theme_manager.night_mode)
+        ),
+    )
+
+
+def bench_recolor_web(res: Results, addon: Any) -> None:
+    colors = sys.modules[f"{ADDON_MODULE}.colors"]
+    compiler = sys.modules[f"{ADDON_MODULE}.compiler"]
+    from aqt.qt import sip
+    from aqt.webview import AnkiWebView
+
+    saved_colors = colors.conf.get_copy("colors")
+    themes = [compiler.compile_theme(toggled(saved_colors, step)) for step in (0, 1)]
+    for count in WEBVIEW_COUNTS:
+        webviews = [AnkiWebView() for _ in range(count)]
+        for webview in webviews:
+            webview.show()
+        steps = iter(range(10**9))
+
+        def change() -> None:
+            colors._compiled_theme = themes[next(steps) % 2]
+            colors._compiled_theme_stale = False
+
+        res.measure(
+            f"web.recolor_web (changed, {count} webviews)",
+            colors.recolor_web,
+            setup=change,
+            webviews=count,
+        )
+        res.measure(
+            f"web.recolor_web (unchanged, {count} webviews)",
+            colors.recolor_web,
+            webviews=count,
+        )
+        for webview in webviews:
+            webview.cleanup()
+            sip.delete(webview)
+    colors.invalidate_compiled_theme()
+
+
+def bench_config(res: Results, addon: Any, addons_dir: Path) -> None:
+    conf = sys.modules[f"{ADDON_MODULE}.colors"].conf
+    color_count = len(conf["colors"])
+    res.measure("config.get (colors)", lambda: conf.get("colors"), colors=color_count)
+    res.measure(
+        "config.get (colors, legacy)",
+        lambda: legacy.config_get(conf._config, "colors"),
+        colors=color_count,
+    )
+    res.measure("config.get (single color)", lambda: conf.get("colors.CANVAS.1"))
+    res.measure(
+        "config.get (single color, legacy)",
+        lambda: legacy.config_get(conf._config, "colors.CANVAS.1"),
+    )
+    # Every light and dark value by key, like the colors tab used to read them
+    value_keys = [f"colors.{name}.{idx}" for name in conf["colors"] for idx in (1, 2)]
+
+    def get_values() -> None:
+        for key in value_keys:
+            conf.get(key)
+
+    def get_values_legacy() -> None:
+        for key in value_keys:
+            legacy.config_get(conf._config, key)
+
+    res.measure("config.get (every color value)", get_values, keys=len(value_keys))
+    res.measure("config.get (every color value, legacy)", get_values_legacy, keys=len(value_keys))
+    res.measure("config.get_copy (colors)", lambda: conf.get_copy("colors"))
+    res.measure("config.set", lambda: conf.set("colors.CANVAS.1", "#f5f5f5"))
+    conf.save()
+    res.measure("config.load (unchanged)", conf.load)
+    res.measure("config.load (force)", lambda: conf.load(force=True))
+    res.measure("config.save (unchanged)", conf.save)
+
+    def modify() -> None:
+        conf.set("colors.CANVAS.1", "#f5f5f5")
+
+    res.measure("config.save (changed)", conf.save, setup=modify)
+
+
+def bench_migrate(res: Results, addon: Any, addons_dir: Path) -> None:
+    conf = sys.modules[f"{ADDON_MODULE}.colors"].conf
+    migrate = sys.modules[f"{ADDON_MODULE}.migrate"]
+    defaults = conf.get_default_copy("")
+    v1_config = json.loads((ADDON_SRC / "v1_anki_config.json").read_text())
+    v1_config["version"] = {"major": 1, "minor": 0}
+    v2_config = copy.deepcopy(defaults)
+    del v2_config["colors"]["CANVAS_GLASS"]
+    v2_config["colors"]["CANVAS"][3] = "--canvas"
+    v2_config["colors"]["FG"][3] = "--fg"
+    v2_config["version"] = {"major": 2, "minor": 0}
+    version = migrate.current_version()
+    v3_config = copy.deepcopy(defaults)
+    v3_config["version"] = {"major": version[0], "minor": version[1]}
+
+    for name, config in (("v1", v1_config), ("v2", v2_config), ("v3", v3_config)):
+
+        def setup(config: Dict[str, Any] = config) -> None:
+            write_config(addons_dir, config)
+            conf.load(force=True)
+
+        res.measure(
+            f"migrate.maybe_migrate_config ({name})",
+            lambda: migrate.maybe_migrate_config(conf),
+            setup=setup,
+        )
+    write_config(addons_dir, v3_config)
+    conf.load(force=True)
+
+
+def bench_themes(res: Results, addon: Any) -> None:
+    # Imported on first use of the menu entry
+    config = importlib.import_module(f"{ADDON_MODULE}.config")
+    themes = sys.modules[f"{ADDON_MODULE}.themes"]
+    ankiaddonconfig = sys.modules[f"{ADDON_MODULE}.ankiaddonconfig"]
+
+    res.measure(
+        "themes.catalog index (cold)",
+        themes.catalog.names,
+        setup=themes.catalog.refresh,
+    )
+    conf_window = ankiaddonconfig.ConfigWindow(config.conf)
+    for fn in config.conf.window_open_hook:
+        fn(conf_window)
+    conf_window.update_widgets()
+    for theme in themes.catalog.names():
+        res.measure(
+            f"themes.apply_theme ({theme})",
+            lambda: config.apply_theme(conf_window, theme),
+            theme=theme,
+        )
+    conf_window.close()
+    config.conf.load(force=True)
+
+
+def bench_config_window(res: Results, addon: Any) -> None:
+    config = importlib.import_module(f"{ADDON_MODULE}.config")
+    from aqt.qt import sip
+
+    windows: List[Any] = []
+
+    def open_window() -> None:
+        "ConfigManager.open_config() without exec()"
+        conf_window = config.conf.build_config_window()
+        conf_window.on_open()
+        windows.append(conf_window)
+
+    def discard_windows() -> None:
+        while windows:
+            sip.delete(windows.pop())
+        config.conf.config_window = None
+
+    def build_all_tabs() -> None:
+        tabs = windows[-1].main_tab
+        for index in range(tabs.count()):
+            tabs.setCurrentIndex(index)
+
+    res.measure("window.open", open_window, setup=discard_windows)
+
+    def open_and_discard() -> None:
+        discard_windows()
+        open_window()
+
+    res.measure("window.build all tabs", build_all_tabs, setup=open_and_discard)
+
+    def prepare_and_discard() -> None:
+        discard_windows()
+        windows.append(config.conf.build_config_window())
+        windows[-1].prepare()
+
+    res.measure("window.open (prebuilt)", lambda: windows[-1].on_open(), setup=prepare_and_discard)
+
+    def close_window() -> None:
+        windows[-1].close()
+
+    res.measure("window.reopen", lambda: windows[-1].on_open(), setup=close_window)
+    discard_windows()
+
+
+def bench_color_table(res: Results, addon: Any) -> None:
+    config = importlib.import_module(f"{ADDON_MODULE}.config")
+    colortable = sys.modules[f"{ADDON_MODULE}.colortable"]
+    conf = config.conf
+    original = conf.get_copy("colors")
+    colors = copy.deepcopy(original)
+    for i in range(500 - len(colors)):
+        colors[f"BENCH_{i}"] = [f"Bench {i}", "#123456", "#abcdef80", f"--bench-{i}"]
+    conf.set("colors", colors)
+
+    model = colortable.ColorTableModel(conf)
+    proxy = colortable.ColorFilterModel(model)
+    res.measure("colortable.model (500 colors)", lambda: colortable.ColorTableModel(conf))
+    res.measure("colortable.sync unchanged (500 colors)", model.sync)
+    res.measure(
+        "colortable.filter (500 colors)",
+        lambda: proxy.setFilterFixedString("bench 4"),
+        setup=lambda: proxy.setFilterFixedString(""),
+    )
+    res.measure(
+        "colortable.sort by lightness (500 colors)",
+        lambda: proxy.sort(colortable.LIGHT),
+        setup=lambda: proxy.sort(-1),
+    )
+    conf.set("colors", original)
+
+
+def bench_rgba(res: Results, addon: Any) -> None:
+    rgba = sys.modules[f"{ADDON_MODULE}.rgba"]
+    conf = sys.modules[f"{ADDON_MODULE}.colors"].conf
+    values = [
+        value
+        for entry in conf.get_default_copy("colors").values()
+        for value in entry[1:3]
+        if isinstance(value, str)
+    ]
+
+    def parse_uncached() -> None:
+        for value in values:
+            rgba._parse(value)
+
+    def to_qt_argb() -> None:
+        for value in values:
+            rgba.to_qt_argb(value)
+
+    def to_qt_argb_legacy() -> None:
+        for value in values:
+            legacy.hex_with_alpha_to_argb(value)
+
+    def to_css_rgba() -> None:
+        for value in values:
+            rgba.to_css_rgba(value)
+
+    def to_css_rgba_legacy() -> None:
+        for value in values:
+            legacy.hex_with_alpha_to_rgba(value)
+
+    res.measure("rgba.parse (uncached, all default colors)", parse_uncached, colors=len(values))
+    res.measure("rgba.to_qt_argb (all default colors)", to_qt_argb, colors=len(values))
+    res.measure("rgba.to_qt_argb (all default colors, legacy)", to_qt_argb_legacy, colors=len(values))
+    res.measure("rgba.to_css_rgba (all default colors)", to_css_rgba, colors=len(values))
+    res.measure("rgba.to_css_rgba (all default colors, legacy)", to_css_rgba_legacy, colors=len(values))
+
+    # Distinct colors, so the memoization doesn't help. These are slower than legacy, see rgba.py
+    rand = random.Random(0)
+    distinct = ["#%08x" % rand.getrandbits(32) for _ in range(1000)]
+    for _ in range(1000):
+        r, g, b = (rand.randrange(256) for _ in range(3))
+        distinct.append(f"rgba({r}, {g}, {b}, 0.{rand.randrange(1, 10)})")
+
+    def to_qt_argb_distinct() -> None:
+        rgba.to_qt_argb.cache_clear()
+        rgba.parse.cache_clear()
+        for value in distinct:
+            rgba.to_qt_argb(value)
+
+    def to_qt_argb_distinct_legacy() -> None:
+        for value in distinct:
+            legacy.hex_with_alpha_to_argb(value)
+
+    res.measure("rgba.to_qt_argb (2000 distinct colors)", to_qt_argb_distinct, colors=len(distinct))
+    res.measure(
+        "rgba.to_qt_argb (2000 distinct colors, legacy)",
+        to_qt_argb_distinct_legacy,
+        colors=len(distinct),
+    )
+
+
+def bench_diagnostics(res: Results, addon: Any) -> None:
+    diagnostics = sys.modules[f"{ADDON_MODULE}.diagnostics"]
+
+    def timed_stage() -> None:
+        with diagnostics.stage("benchmark") as stage:
+            stage.note(items=1)
+
+    enabled = diagnostics.enabled
+    diagnostics.set_enabled(False)
+    res.measure("diagnostics.stage (disabled)", timed_stage)
+    diagnostics.set_enabled(True)
+    res.measure("diagnostics.stage (enabled)", timed_stage)
+    diagnostics.set_enabled(enabled)
+    diagnostics.clear()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-o", "--output", default="benchmark_results.json")
+    parser.add_argument("--quick", action="store_true", help="fewer runs, for a smoke test")
+    args = parser.parse_args()
+
+    res = Results(args.quick)
+    with tempfile.TemporaryDirectory(prefix="recolor-bench-") as tmp:
+        addons_dir = Path(tmp)
+        install_addon(addons_dir)
+        addon, import_time = load_addon(addons_dir)
+        res.entries["startup.import_addon"] = {"median_s": import_time, "runs": 1}
+        print(f"{'startup.import_addon':<50} {import_time * 1e6:>12.1f} us")
+        for stage in addon.startup.stages:
+            name = f"startup.{stage.name}"
+            res.entries[name] = {"median_s": stage.seconds, "runs": 1}
+            print(f"{name:<50} {stage.seconds * 1e6:>12.1f} us")
+
+        bench_theme(res, addon)
+        bench_inject_web_ts(res, addon)
+        bench_recolor_python(res, addon)
+        bench_recolor_web(res, addon)
+        bench_config(res, addon, addons_dir)
+        bench_migrate(res, addon, addons_dir)
+        bench_themes(res, addon)
+        bench_config_window(res, addon)
+        bench_color_table(res, addon)
+        bench_rgba(res, addon)
+        bench_diagnostics(res, addon)
+
+    from aqt.qt import PYQT_VERSION_STR, QT_VERSION_STR
+
+    output = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "qt": QT_VERSION_STR,
+            "pyqt": PYQT_VERSION_STR,
+            "platform": platform.platform(),
+            "quick": args.quick,
+        },
+        "results": res.entries,
+    }
+    Path(args.output).write_text(json.dumps(output, indent=2), encoding="utf8")
+    print(f"Saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+from typing import Any, Callable
+
+
+def wrap(old: Any, new: Any, pos: str = "after") -> Callable:
+    def repl(*args: Any, **kwargs: Any) -> Any:
+        if pos == "after":
+            old(*args, **kwargs)
+            return new(*args, **kwargs)
+        elif pos == "before":
+            new(*args, **kwargs)
+            return old(*args, **kwargs)
+        else:
+            return new(_old=old, *args, **kwargs)
+
+    return repl
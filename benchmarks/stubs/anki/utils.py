@@ -0,0 +1,4 @@
+import sys
+
+is_mac = sys.platform.startswith("darwin")
+is_win = sys.platform.startswith("win32")
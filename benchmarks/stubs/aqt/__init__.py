@@ -0,0 +1,108 @@
+"""Minimal stand-in for Anki's aqt package, enough to import and run the add-on headlessly.
+
+Call setup() before importing the add-on, as the add-on reads aqt.mw at import time.
+"""
+
+from typing import Any, Callable, Dict, Optional
+from pathlib import Path
+import json
+import sys
+
+from . import gui_hooks
+from .qt import QApplication, QMainWindow, QMenuBar
+
+mw: Any = None
+
+
+class AddonMeta:
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def human_name(self) -> str:
+        return self.name
+
+
+class AddonManager:
+    "The parts of aqt.addons.AddonManager the add-on uses, on a plain addons folder"
+
+    def __init__(self, addons_dir: Path) -> None:
+        self.addons_dir = addons_dir
+        self.config_actions: Dict[str, Callable] = {}
+
+    def addonsFolder(self, module: Optional[str] = None) -> str:
+        if module is None:
+            return str(self.addons_dir)
+        return str(self.addons_dir / module)
+
+    def addon_meta(self, module: str) -> AddonMeta:
+        return AddonMeta(module)
+
+    def addonName(self, module: str) -> str:
+        return module
+
+    def addonMeta(self, module: str) -> Dict[str, Any]:
+        path = Path(self.addonsFolder(module)) / "meta.json"
+        try:
+            return json.loads(path.read_text(encoding="utf8"))
+        except (OSError, ValueError):
+            return {}
+
+    def writeAddonMeta(self, module: str, meta: Dict[str, Any]) -> None:
+        path = Path(self.addonsFolder(module)) / "meta.json"
+        path.write_text(json.dumps(meta), encoding="utf8")
+
+    def addonConfigDefaults(self, module: str) -> Optional[Dict[str, Any]]:
+        path = Path(self.addonsFolder(module)) / "config.json"
+        try:
+            return json.loads(path.read_text(encoding="utf8"))
+        except OSError:
+            return None
+
+    def getConfig(self, module: str) -> Optional[Dict[str, Any]]:
+        config = self.addonConfigDefaults(module)
+        if config is None:
+            return None
+        user_config = self.addonMeta(module).get("config", {})
+        config.update(user_config)
+        return config
+
+    def writeConfig(self, module: str, conf: Dict[str, Any]) -> None:
+        meta = self.addonMeta(module)
+        meta["config"] = conf
+        self.writeAddonMeta(module, meta)
+
+    def setConfigAction(self, module: str, fn: Callable) -> None:
+        self.config_actions[module] = fn
+
+
+class ProgressManager:
+    def single_shot(
+        self, delay: int, callback: Callable[[], None], requires_collection: bool = True
+    ) -> None:
+        "Runs the callback right away, so timings include the deferred work"
+        callback()
+
+
+class Form:
+    def __init__(self, window: QMainWindow) -> None:
+        self.menubar = QMenuBar(window)
+
+
+class MainWindow(QMainWindow):
+    def __init__(self, app: QApplication, addons_dir: Path) -> None:
+        QMainWindow.__init__(self)
+        self.app = app
+        self.addonManager = AddonManager(addons_dir)
+        self.progress = ProgressManager()
+        self.form = Form(self)
+        self.web = None
+        self.toolbarWeb = None
+        self.bottomWeb = None
+        self.pm = None
+
+
+def setup(addons_dir: Path) -> Any:
+    global mw
+    app = QApplication.instance() or QApplication(sys.argv)
+    mw = MainWindow(app, addons_dir)  # type: ignore
+    return mw
@@ -0,0 +1,20 @@
+"The config editor of the add-ons dialog"
+
+from typing import Any, Dict
+import json
+
+import aqt
+from aqt.qt import QDialog, QWidget
+
+
+class ConfigEditor(QDialog):
+    "Edits the config as json text. Accepting writes it the way Anki does, in place."
+
+    def __init__(self, dlg: QWidget, addon: str, conf: Dict[str, Any]) -> None:
+        QDialog.__init__(self, dlg)
+        self.addon = addon
+        self.text = json.dumps(conf, indent=4)
+
+    def accept(self) -> None:
+        aqt.mw.addonManager.writeConfig(self.addon, json.loads(self.text))
+        QDialog.accept(self)
@@ -0,0 +1,6 @@
+"The color definitions of the Anki version ReColor's default config was extracted from"
+
+from pathlib import Path
+
+_source = Path(__file__).resolve().parents[3] / "extract_colors" / "colors.py"
+exec(compile(_source.read_text(encoding="utf8"), str(_source), "exec"))
@@ -0,0 +1,18 @@
+"Every hook is a plain list of callbacks, created on first access"
+
+from typing import Any, Callable, Dict, List
+
+
+class Hook(List[Callable]):
+    def __call__(self, *args: Any) -> None:
+        for fn in list(self):
+            fn(*args)
+
+
+_hooks: Dict[str, Hook] = {}
+
+
+def __getattr__(name: str) -> Hook:
+    if name.startswith("__"):
+        raise AttributeError(name)
+    return _hooks.setdefault(name, Hook())
@@ -0,0 +1,8 @@
+# Re-exports like aqt.qt does
+from typing import TypeVar, Union  # noqa: F401
+
+from anki.utils import is_mac, is_win  # noqa: F401
+from PyQt6.QtCore import *  # type: ignore
+from PyQt6.QtGui import *  # type: ignore
+from PyQt6.QtWidgets import *  # type: ignore
+from PyQt6 import sip  # noqa: F401
@@ -0,0 +1,31 @@
+from typing import Any, Dict
+
+from . import colors
+from .qt import QApplication, QColor
+
+
+class ThemeManager:
+    def __init__(self) -> None:
+        self.night_mode = False
+
+    def var(self, vars: Dict[str, str]) -> str:
+        return vars["dark" if self.night_mode else "light"]
+
+    def qcolor(self, colors: Dict[str, str]) -> QColor:
+        return QColor(self.var(colors))
+
+    def _apply_style(self, app: QApplication) -> None:
+        "Sets a stylesheet of about the size of Anki's"
+        rules = []
+        for name in dir(colors):
+            value = getattr(colors, name)
+            if isinstance(value, dict) and "light" in value:
+                css_name = name.lower().replace("_", "-")
+                rules.append(f"QWidget[class=\"{css_name}\"] {{ color: {self.var(value)}; }}")
+        app.setStyleSheet("\n".join(rules))
+
+    def apply_style(self) -> None:
+        self._apply_style(QApplication.instance())  # type: ignore
+
+
+theme_manager = ThemeManager()
@@ -0,0 +1,27 @@
+"Dialogs and tooltips do nothing"
+
+from typing import Any
+
+
+def tooltip(*args: Any, **kwargs: Any) -> None:
+    pass
+
+
+def showInfo(*args: Any, **kwargs: Any) -> None:
+    pass
+
+
+def showText(*args: Any, **kwargs: Any) -> Any:
+    raise NotImplementedError
+
+
+def openLink(*args: Any, **kwargs: Any) -> None:
+    pass
+
+
+def saveGeom(*args: Any, **kwargs: Any) -> None:
+    pass
+
+
+def restoreGeom(*args: Any, **kwargs: Any) -> None:
+    pass
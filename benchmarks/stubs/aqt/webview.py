@@ -0,0 +1,34 @@
+from typing import Any, List, Optional
+
+from .qt import QColor, QWidget
+
+
+class WebContent:
+    def __init__(self) -> None:
+        self.head = ""
+        self.body = ""
+
+
+class AnkiWebView(QWidget):
+    "Counts the javascript it is asked to run instead of running it"
+
+    def __init__(self, parent: Optional[QWidget] = None, title: str = "default") -> None:
+        QWidget.__init__(self, parent)
+        self.title = title
+        self.evals = 0
+        self.eval_bytes = 0
+
+    def eval(self, js: str) -> None:
+        self.evals += 1
+        self.eval_bytes += len(js)
+
+    def cleanup(self) -> None:
+        pass
+
+    def get_window_bg_color(self, night_mode: Optional[bool] = None) -> QColor:
+        from . import colors
+        from .theme import theme_manager
+
+        if night_mode is None:
+            night_mode = theme_manager.night_mode
+        return QColor(colors.CANVAS["dark" if night_mode else "light"])
@@ -18,6 +18,6 @@ with json_path.open("w") as f:
     simplejson.dump(manifest, f, indent=2)
 
 # human_version is only updated on install.
-# For developing purposes, use VERSION file to check current version
-version_path = addon_dir / "VERSION"
-version_path.write_text(version_string)
+# The add-on reads its version from version.py, so checking it on startup doesn't need a file read
+version_path = addon_dir / "version.py"
+version_path.write_text(f'# Written by release/new_version.py\nVERSION = "{version_string}"\n')
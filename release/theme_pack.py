@@ -0,0 +1,26 @@
+# Convert between the json themes and a theme pack.
+#   python release/theme_pack.py pack src/addon/themes themes.rctp
+#   python release/theme_pack.py unpack themes.rctp out_dir
+import importlib.util
+import sys
+from pathlib import Path
+
+addon_dir = Path(__file__).resolve().parents[1] / "src" / "addon"
+
+# Import addon.themepack without running the add-on's __init__.py, which needs Anki
+spec = importlib.util.spec_from_file_location(
+    "addon", addon_dir / "__init__.py", submodule_search_locations=[str(addon_dir)]
+)
+assert spec is not None
+sys.modules["addon"] = importlib.util.module_from_spec(spec)
+from addon import themepack  # noqa: E402
+
+command, source, target = sys.argv[1:4]
+if command == "pack":
+    names = themepack.pack_json_themes(Path(source), Path(target))
+elif command == "unpack":
+    Path(target).mkdir(parents=True, exist_ok=True)
+    names = themepack.unpack_json_themes(Path(source), Path(target))
+else:
+    sys.exit(f"Unknown command {command}, expected pack or unpack")
+print(f"{command}ed {len(names)} themes")
@@ -1,9 +1,19 @@
-from .ankiaddonconfig import ConfigManager
-from .migrate import maybe_migrate_config
+from . import startup
 
-conf = ConfigManager()
-maybe_migrate_config(conf)
+with startup.stage("config"):
+    from .ankiaddonconfig import ConfigManager
+    from .migrate import maybe_migrate_config
 
-from . import colors
-from . import menu
-from . import config
+    # Shared by all modules of the add-on
+    conf = ConfigManager()
+    maybe_migrate_config(conf)
+
+# Colors Qt and the webviews before the first paint
+with startup.stage("colors"):
+    from . import colors
+
+# The config window code is imported when the menu entry is first used
+with startup.stage("menu"):
+    from . import menu
+
+startup.finish()
@@ -1,3 +1,16 @@
+from typing import Any, TYPE_CHECKING
+
 from .manager import ConfigManager
-from .window import ConfigWindow, ConfigLayout
 from .version import Version
+
+if TYPE_CHECKING:
+    from .window import ConfigWindow, ConfigLayout
+
+
+def __getattr__(name: str) -> Any:
+    "The window module is only imported when the config window is first used"
+    if name in ("ConfigWindow", "ConfigLayout"):
+        from . import window
+
+        return getattr(window, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
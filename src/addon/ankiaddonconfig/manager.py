@@ -1,18 +1,43 @@
 import json
 import copy
-from typing import Any, Callable, Dict, Iterator, List, Optional
+import functools
+import os
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TYPE_CHECKING
 
 from aqt import mw
 from aqt.qt import *
 
-from .window import ConfigWindow
+from .readonly import ReadOnlyDict, ReadOnlyList, read_only
+
+if TYPE_CHECKING:
+    from .window import ConfigWindow
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_key(key: str) -> Tuple[Tuple[str, Optional[int]], ...]:
+    """Splits a dotted config key into (dict key, list index) pairs.
+    The list index is None if the level isn't a number. An empty key is the config root."""
+    if key == "":
+        return ()
+    return tuple(
+        (level, int(level) if level.isdigit() else None) for level in key.split(".")
+    )
 
 
 class ConfigManager:
     def __init__(self) -> None:
-        self.config_window: Optional[ConfigWindow] = None
-        self.window_open_hook: List[Callable[[ConfigWindow], None]] = []
+        self.config_window: Optional["ConfigWindow"] = None
+        self.window_open_hook: List[Callable[["ConfigWindow"], None]] = []
         self._config: Dict
+        # True if the config was modified since it was last loaded or saved
+        self._dirty = False
+        # File stats of config.json and meta.json when the config was last loaded or saved
+        self._disk_token: Optional[Tuple[Any, ...]] = None
+        # Save statistics
+        self.saves_written = 0
+        self.saves_skipped = 0
+        self.last_save_time = 0.0  # seconds spent writing the last save
         addon_dir = __name__.split(".")[0]
         self.addon_dir = addon_dir
         try:
@@ -22,75 +47,148 @@ class ConfigManager:
         self._default = mw.addonManager.addonConfigDefaults(addon_dir)
         self.load()
 
-    def load(self) -> None:
-        "Loads config from disk"
+    def load(self, force: bool = False) -> None:
+        """Loads config from disk, discarding unsaved changes.
+        Does nothing if there are no unsaved changes and the files didn't change since the last load,
+        unless force is True."""
+        token = self._read_disk_token()
+        if not force and not self._dirty and token == self._disk_token:
+            return
         self._config = mw.addonManager.getConfig(self.addon_dir)
-
-    def save(self) -> None:
-        "Writes its config data to disk."
-        mw.addonManager.writeConfig(self.addon_dir, self._config)
+        self._dirty = False
+        self._disk_token = token
+
+    def _read_disk_token(self) -> Tuple[Any, ...]:
+        "getConfig() reads both config.json and meta.json"
+        addon_folder = mw.addonManager.addonsFolder(self.addon_dir)
+        token: List[Any] = []
+        for filename in ("config.json", "meta.json"):
+            try:
+                stat = os.stat(os.path.join(addon_folder, filename))
+                token.append((stat.st_mtime_ns, stat.st_size, stat.st_ino))
+            except OSError:
+                token.append(None)
+        return tuple(token)
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    def save(self, force: bool = False) -> None:
+        """Writes its config data to disk, if it was modified since the last load or save.
+        So calling save() repeatedly only writes once."""
+        if not self._dirty and not force:
+            self.saves_skipped += 1
+            return
+        start = time.perf_counter()
+        self._write_atomic()
+        self._dirty = False
+        self._disk_token = self._read_disk_token()
+        self.saves_written += 1
+        self.last_save_time = time.perf_counter() - start
+
+    def _write_atomic(self) -> None:
+        """Same as addonManager.writeConfig(), but writes to a temporary file first
+        so a crash mid-write can't leave a corrupt meta.json behind."""
+        mgr = mw.addonManager
+        meta = mgr.addonMeta(self.addon_dir)
+        meta["config"] = self._config
+        path = os.path.join(mgr.addonsFolder(self.addon_dir), "meta.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf8") as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
 
     def load_defaults(self) -> None:
         "call .save() afterwards to restore defaults."
         self._config = copy.deepcopy(self._default)
+        self._dirty = True
 
     def to_json(self) -> str:
         return json.dumps(self._config)
 
-    def get_from_dict(self, dict_obj: dict, key: str) -> Any:
-        "Raises KeyError if config doesn't exist"
-        levels = key.split(".")
-        return_val = dict_obj
-        for level in levels:
+    def _lookup(self, dict_obj: dict, key: str) -> Any:
+        "Returns the value itself, not a copy. Raises KeyError if config doesn't exist"
+        return_val: Any = dict_obj
+        for level, index in parse_key(key):
             if isinstance(return_val, list):
-                level = int(level)
-            return_val = return_val[level]
-        return copy.deepcopy(return_val)
+                if index is None:
+                    raise KeyError(key)
+                try:
+                    return_val = return_val[index]
+                except IndexError:
+                    raise KeyError(key)
+            else:
+                return_val = return_val[level]
+        return return_val
+
+    def get_from_dict(self, dict_obj: dict, key: str) -> Any:
+        "Raises KeyError if config doesn't exist. Returns a deep copy."
+        return copy.deepcopy(self._lookup(dict_obj, key))
 
     def copy(self) -> Dict:
         return copy.deepcopy(self._config)
 
     def get(self, key: str, default: Any = None) -> Any:
-        "Returns default or None if config dones't exist"
+        """Returns default or None if config dones't exist.
+        Dicts and lists are returned as read-only views, use get_copy() if you need to modify them."""
+        try:
+            return read_only(self._lookup(self._config, key))
+        except KeyError:
+            return default
+
+    def get_copy(self, key: str, default: Any = None) -> Any:
+        "Like get(), but returns a mutable deep copy"
         try:
             return self.get_from_dict(self._config, key)
         except KeyError:
             return default
 
     def get_default(self, key: str) -> Any:
+        "Read-only like get(). Raises KeyError if config doesn't exist"
+        return read_only(self._lookup(self._default, key))
+
+    def get_default_copy(self, key: str) -> Any:
         return self.get_from_dict(self._default, key)
 
     def set(self, key: str, value: Any) -> None:
-        levels = key.split(".")
-        conf_obj = self._config
-        for i in range(len(levels) - 1):
-            level = levels[i]
+        levels = parse_key(key)
+        conf_obj: Any = self._config
+        for level, index in levels[:-1]:
             if isinstance(conf_obj, list):
-                level = int(level)
+                conf_obj = conf_obj[index]
+                continue
             try:
                 conf_obj = conf_obj[level]
             except KeyError:
                 conf_obj[level] = {}
                 conf_obj = conf_obj[level]
-        level = levels[-1]
+        level, index = levels[-1]
+        if isinstance(value, (ReadOnlyDict, ReadOnlyList)):
+            value = value.copy()
+        self._dirty = True
         if isinstance(conf_obj, list):
-            level = int(level)
-        conf_obj[level] = value
+            conf_obj[index] = value
+        else:
+            conf_obj[level] = value
 
     def pop(self, key: str) -> Any:
-        levels = key.split(".")
-        conf_obj = self._config
-        for i in range(len(levels) - 1):
-            level = levels[i]
+        levels = parse_key(key)
+        conf_obj: Any = self._config
+        for level, index in levels[:-1]:
             if isinstance(conf_obj, list):
-                level = int(level)
+                conf_obj = conf_obj[index]
+                continue
             try:
                 conf_obj = conf_obj[level]
             except KeyError:
                 return None
-        level = levels[-1]
+        level, index = levels[-1]
+        self._dirty = True
         if isinstance(conf_obj, list):
-            level = int(level)
+            return conf_obj.pop(index)
         return conf_obj.pop(level)
 
     def __getitem__(self, key: str) -> Any:
@@ -108,18 +206,26 @@ class ConfigManager:
 
     def __contains__(self, key: str) -> bool:
         try:
-            self.get_from_dict(self._config, key)
+            self._lookup(self._config, key)
             return True
         except KeyError:
             return False
 
     # Config Window
 
+    def build_config_window(self) -> "ConfigWindow":
+        "Returns the config window, creating it on first use. It is hidden, not destroyed, on close."
+        if self.config_window is None or sip.isdeleted(self.config_window):
+            from .window import ConfigWindow
+
+            config_window = ConfigWindow(self)
+            self.config_window = config_window
+            for fn in self.window_open_hook:
+                fn(config_window)
+        return self.config_window
+
     def open_config(self) -> bool:
-        config_window = ConfigWindow(self)
-        self.config_window = config_window
-        for fn in self.window_open_hook:
-            fn(config_window)
+        config_window = self.build_config_window()
         config_window.on_open()
         config_window.exec()
         return True
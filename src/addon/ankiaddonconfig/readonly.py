@@ -0,0 +1,84 @@
+import copy
+from typing import Any, Dict, Iterator, List, Mapping, Sequence, Union, overload
+
+
+class ReadOnlyDict(Mapping[str, Any]):
+    """Read-only view of a config dict. Creating one doesn't copy anything.
+
+    Nested dicts and lists are returned as views as well.
+    Call .copy() to get a mutable deep copy.
+    """
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        self._data = data
+
+    def __getitem__(self, key: str) -> Any:
+        return read_only(self._data[key])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._data
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, ReadOnlyDict):
+            other = other._data
+        return self._data == other
+
+    def __repr__(self) -> str:
+        return f"ReadOnlyDict({self._data!r})"
+
+    def copy(self) -> Dict[str, Any]:
+        return copy.deepcopy(self._data)
+
+
+class ReadOnlyList(Sequence[Any]):
+    """Read-only view of a config list. See ReadOnlyDict."""
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: List[Any]) -> None:
+        self._data = data
+
+    @overload
+    def __getitem__(self, index: int) -> Any:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "ReadOnlyList":
+        ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            return ReadOnlyList(self._data[index])
+        return read_only(self._data[index])
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, ReadOnlyList):
+            other = other._data
+        return self._data == other
+
+    def __repr__(self) -> str:
+        return f"ReadOnlyList({self._data!r})"
+
+    def copy(self) -> List[Any]:
+        return copy.deepcopy(self._data)
+
+
+def read_only(value: Any) -> Any:
+    "Wraps dicts and lists in a read-only view. Other json values are already immutable."
+    if isinstance(value, dict):
+        return ReadOnlyDict(value)
+    if isinstance(value, list):
+        return ReadOnlyList(value)
+    return value
+
@@ -1,4 +1,4 @@
-from typing import Callable, List, Tuple, TYPE_CHECKING, Optional
+from typing import Callable, Dict, Iterable, List, Tuple, TYPE_CHECKING, Optional
 from pathlib import Path
 
 import aqt.addons
@@ -8,6 +8,12 @@ from aqt.utils import tooltip, showText, saveGeom, restoreGeom
 
 from .errors import InvalidConfigValueError
 
+try:
+    from .. import rgba
+except ImportError:
+    # Imported as a top-level package, next to rgba.py (see tests/conftest.py)
+    import rgba  # type: ignore[no-redef]
+
 if TYPE_CHECKING:
     from .manager import ConfigManager
 
@@ -21,10 +27,19 @@ class ConfigWindow(QDialog):
         self.conf = conf
         self.mgr = mw.addonManager
         self.widget_updates: List[Callable[[], None]] = []
+        # config key -> updates of the widgets that show it
+        self.key_updates: Dict[str, List[Callable[[], None]]] = {}
         self.should_save_hook: List[Callable[[], bool]] = []
         self.after_advanced_save_hook: List[Callable[[], None]] = []
+        # Called with (key, color) while a color is being picked, and with the previous color on cancel
+        self.color_preview_hook: List[Callable[[str, str], None]] = []
         self._on_save_hook: List[Callable[[], None]] = []
         self._on_close_hook: List[Callable[[], None]] = []
+        # Tabs added with add_lazy_tab() that weren't shown yet
+        self._lazy_tabs: Dict[QWidget, Callable[["ConfigLayout"], None]] = {}
+        self._opened = False
+        # The config the widgets show while the window is hidden, to resync them on reopen
+        self._shown_config: Optional[Dict] = None
         self.geom_key = f"addonconfig-{conf.addon_name}"
 
         self.setWindowTitle(f"Config for {conf.addon_name}")
@@ -41,6 +56,7 @@ class ConfigWindow(QDialog):
         self.main_tab = QTabWidget()
         main_tab = self.main_tab
         main_tab.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
+        main_tab.currentChanged.connect(self.build_tab)
         self.main_layout.addWidget(main_tab)
         self.setup_buttons(self.btn_layout)
 
@@ -65,9 +81,39 @@ class ConfigWindow(QDialog):
         self.save_btn.clicked.connect(self.on_save)
         btn_box.addWidget(self.save_btn)
 
-    def update_widgets(self) -> None:
+    def subscribe(self, key: str, update: Callable[[], None]) -> None:
+        "Registers a widget update that runs when key changes"
+        self.widget_updates.append(update)
+        self.key_updates.setdefault(key, []).append(update)
+
+    def update_widgets(self, keys: Optional[Iterable[str]] = None) -> None:
+        """Updates the widgets from the config.
+        If keys is given, only the widgets of those config keys, their parents and their children are updated."""
+        if keys is None:
+            self._run_widget_updates(self.widget_updates)
+        else:
+            self._run_widget_updates(self.updates_for_keys(keys))
+
+    def updates_for_keys(self, keys: Iterable[str]) -> List[Callable[[], None]]:
+        changed = set(keys)
+        if "" in changed:
+            return self.widget_updates
+        changed_and_parents = set()
+        for key in changed:
+            levels = key.split(".")
+            for i in range(1, len(levels) + 1):
+                changed_and_parents.add(".".join(levels[:i]))
+        updates: List[Callable[[], None]] = []
+        for widget_key, widget_updates in self.key_updates.items():
+            if widget_key in changed_and_parents or any(
+                parent in changed for parent in _parent_keys(widget_key)
+            ):
+                updates.extend(widget_updates)
+        return updates
+
+    def _run_widget_updates(self, widget_updates: List[Callable[[], None]]) -> None:
         try:
-            for widget_update in self.widget_updates:
+            for widget_update in widget_updates:
                 widget_update()
         except Exception as e:
             advanced = self.advanced_window()
@@ -83,18 +129,39 @@ class ConfigWindow(QDialog):
             bbox.button(QDialogButtonBox.StandardButton.Close).setDefault(True)
 
             def quit() -> None:
-                self.widget_updates = []
+                self.widget_updates.clear()
+                self.key_updates.clear()
                 dial.close()
                 advanced.reject()
                 self.close()
+                # The next open builds a new window
+                if self.conf.config_window is self:
+                    self.conf.config_window = None
+                self.deleteLater()
 
             button.clicked.connect(quit)
             dial.setModal(True)
             dial.show()
 
-    def on_open(self) -> None:
+    def prepare(self) -> None:
+        """Builds the current tab and fills in the widgets without showing the window.
+        Can be called ahead of time, to make the first open faster."""
+        if self._opened:
+            return
+        self._opened = True
+        self.build_tab(self.main_tab.currentIndex())
         self.update_widgets()
         restoreGeom(self, self.geom_key)
+        self._shown_config = self.conf.copy()
+
+    def on_open(self) -> None:
+        """Called before the window is shown.
+        When it is reopened, only the widgets of keys that changed while it was hidden are updated."""
+        self.prepare()
+        if self._shown_config is not None:
+            self.conf.load()
+            self.update_widgets(changed_keys(self._shown_config, self.conf._config))
+            self._shown_config = None
 
     def on_save(self) -> None:
         for hook in self.should_save_hook:
@@ -108,6 +175,10 @@ class ConfigWindow(QDialog):
     def on_cancel(self) -> None:
         self.close()
 
+    def reject(self) -> None:
+        # Escape would hide the window without closeEvent() discarding the edits
+        self.close()
+
     def on_reset(self) -> None:
         self.conf.load_defaults()
         self.update_widgets()
@@ -118,10 +189,12 @@ class ConfigWindow(QDialog):
 
     def advanced_window(self) -> aqt.addons.ConfigEditor:
         def on_finish(result: int) -> None:
-            self.conf.load()
+            before = self.conf.copy()
+            # The editor may have rewritten the file in place, within the stat token's granularity
+            self.conf.load(force=True)
             for hook in self.after_advanced_save_hook:
                 hook()
-            self.update_widgets()
+            self.update_widgets(changed_keys(before, self.conf._config))
 
         diag = aqt.addons.ConfigEditor(
             self, self.conf.addon_dir, self.conf._config  # type: ignore
@@ -135,6 +208,8 @@ class ConfigWindow(QDialog):
         # and also in case the window was clicked without clicking any of the buttons
         for hook in self._on_close_hook:
             hook()
+        # The window is only hidden, and is reused by the next open
+        self._shown_config = self.conf.copy()
         self.conf.load()
         saveGeom(self, self.geom_key)
         evt.accept()
@@ -148,6 +223,73 @@ class ConfigWindow(QDialog):
         self.main_tab.addTab(tab, name)
         return layout
 
+    def add_lazy_tab(self, name: str, build: Callable[["ConfigLayout"], None]) -> None:
+        """Like add_tab(), but build(layout) is only called when the tab is first shown,
+        so opening the window only builds the current tab."""
+        tab = QWidget(self)
+        self._lazy_tabs[tab] = build
+        self.main_tab.addTab(tab, name)
+
+    def build_tab(self, index: int) -> None:
+        "Builds the tab at index if it is a lazy tab that wasn't built yet"
+        build = self._lazy_tabs.pop(self.main_tab.widget(index), None)
+        if build is None:
+            return
+        tab = self.main_tab.widget(index)
+        layout = ConfigLayout(self, QBoxLayout.Direction.TopToBottom)
+        tab.setLayout(layout)
+        first_update = len(self.widget_updates)
+        build(layout)
+        # Before on_open(), update_widgets() will update them
+        if self._opened:
+            self._run_widget_updates(self.widget_updates[first_update:])
+
+    def pick_color(
+        self, key: str, current: QColor, opacity: bool, on_selected: Callable[[str], None]
+    ) -> None:
+        """Opens a color dialog for the config key, and calls on_selected with the picked color string.
+        Runs color_preview_hook while a color is being picked."""
+        color_dialog = QColorDialog(self)
+        if opacity:
+            color_dialog.setOptions(QColorDialog.ColorDialogOption.ShowAlphaChannel)
+        color_dialog.setCurrentColor(current)
+        color_dialog.colorSelected.connect(
+            lambda c: on_selected(qcolor_to_str(c, opacity))
+        )
+        if self.color_preview_hook:
+            self._connect_preview(color_dialog, key, current, opacity)
+        color_dialog.exec()
+
+    def _connect_preview(
+        self, color_dialog: QColorDialog, key: str, current: QColor, opacity: bool
+    ) -> None:
+        preview_hook = self.color_preview_hook
+        original = self.conf.get(key)
+        preview_color = current
+        # Limit previews to about one per frame while dragging
+        timer = QTimer(color_dialog)
+        timer.setSingleShot(True)
+        timer.setInterval(16)
+
+        def on_color_changed(new_color: QColor) -> None:
+            nonlocal preview_color
+            preview_color = new_color
+            if not timer.isActive():
+                timer.start()
+
+        def preview() -> None:
+            for hook in preview_hook:
+                hook(key, qcolor_to_str(preview_color, opacity))
+
+        def rollback() -> None:
+            timer.stop()
+            for hook in preview_hook:
+                hook(key, original)
+
+        timer.timeout.connect(preview)
+        color_dialog.currentColorChanged.connect(on_color_changed)
+        color_dialog.rejected.connect(rollback)
+
     def execute_on_save(self, hook: Callable[[], None]) -> None:
         self._on_save_hook.append(hook)
 
@@ -181,6 +323,45 @@ class ConfigWindow(QDialog):
         return footer
 
 
+def str_to_qcolor(rgb: str) -> QColor:
+    "Config colors are in CSS syntax, see rgba.py. The QColor is invalid for colors Qt can't read."
+    color = QColor()
+    color.setNamedColor(rgba.to_qt_argb(rgb))  # Accepts #RGB, #RRGGBB, #AARRGGBB or a name
+    return color
+
+
+def qcolor_to_str(color: QColor, opacity: bool) -> str:
+    if opacity:
+        rgb = color.name(QColor.NameFormat.HexArgb)
+        return "#" + rgb[3:] + rgb[1:3]  # ARGB to RGBA
+    return color.name()
+
+
+def _parent_keys(key: str) -> List[str]:
+    "'a.b.c' -> ['a', 'a.b']"
+    levels = key.split(".")
+    return [".".join(levels[:i]) for i in range(1, len(levels))]
+
+
+def changed_keys(old: object, new: object, key: str = "") -> List[str]:
+    "The most specific config keys whose values differ between old and new"
+    if isinstance(old, dict) and isinstance(new, dict):
+        keys = []
+        for k in old.keys() | new.keys():
+            child_key = f"{key}.{k}" if key else k
+            if k not in old or k not in new:
+                keys.append(child_key)
+            else:
+                keys.extend(changed_keys(old[k], new[k], child_key))
+        return keys
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        keys = []
+        for i, (old_item, new_item) in enumerate(zip(old, new)):
+            keys.extend(changed_keys(old_item, new_item, f"{key}.{i}" if key else str(i)))
+        return keys
+    return [] if old == new else [key]
+
+
 class ConfigLayout(QBoxLayout):
     def __init__(self, conf_window: ConfigWindow, direction: QBoxLayout.Direction):
         QBoxLayout.__init__(self, direction)
@@ -206,7 +387,7 @@ class ConfigLayout(QBoxLayout):
                 raise InvalidConfigValueError(key, "boolean", value)
             checkbox.setChecked(value)
 
-        self.widget_updates.append(update)
+        self.config_window.subscribe(key, update)
 
         checkbox.stateChanged.connect(
             lambda s: self.conf.set(
@@ -241,7 +422,7 @@ class ConfigLayout(QBoxLayout):
                 )
             combobox.setCurrentIndex(index)
 
-        self.widget_updates.append(update)
+        self.config_window.subscribe(key, update)
 
         combobox.currentIndexChanged.connect(
             lambda idx: self.conf.set(key, values[idx])
@@ -273,7 +454,7 @@ class ConfigLayout(QBoxLayout):
             line_edit.setText(val)
             line_edit.setCursorPosition(0)
 
-        self.widget_updates.append(update)
+        self.config_window.subscribe(key, update)
 
         line_edit.textChanged.connect(lambda text: self.conf.set(key, text))
 
@@ -326,7 +507,7 @@ class ConfigLayout(QBoxLayout):
                 )
             spin_box.setValue(val)
 
-        self.widget_updates.append(update)
+        self.config_window.subscribe(key, update)
 
         spin_box.valueChanged.connect(lambda val: self.conf.set(key, val))
 
@@ -361,40 +542,26 @@ class ConfigLayout(QBoxLayout):
 
         def set_color(rgb: str) -> None:
             nonlocal color
-            if len(rgb) == 9:
-                rgb = "#" + rgb[7:] + rgb[1:7]  # RGBA to ARGB
-
+            color = str_to_qcolor(rgb)
+            if not color.isValid():
+                raise InvalidConfigValueError(key, "rgb hex color string", rgb)
             button.setStyleSheet(
                 'QPushButton{ background-color: "%s"; border: none; border-radius: 3px}'
-                % rgb  # QT bug? CSS accepts ARGB instead of RGBA.
+                % color.name(QColor.NameFormat.HexArgb)  # QT bug? CSS accepts ARGB instead of RGBA.
             )
-            color = QColor()
-            color.setNamedColor(rgb)  # Accepts #RGB, #RRGGBB or #AARRGGBB
-            if not color.isValid():
-                raise InvalidConfigValueError(key, "rgb hex color string", rgb)
 
         def update() -> None:
             value = self.conf.get(key)
             set_color(value)
 
-        def save(color: QColor) -> None:
-            if opacity:
-                rgb = color.name(QColor.NameFormat.HexArgb)
-                rgb = "#" + rgb[3:] + rgb[1:3]  # ARGB to RGBA
-            else:
-                rgb = color.name()
+        def save(rgb: str) -> None:
             self.conf.set(key, rgb)
             set_color(rgb)
 
         def open_color_dialog() -> None:
-            color_dialog = QColorDialog(self.config_window)
-            if opacity:
-                color_dialog.setOptions(QColorDialog.ColorDialogOption.ShowAlphaChannel)
-            color_dialog.setCurrentColor(color)
-            color_dialog.colorSelected.connect(lambda c: save(c))
-            color_dialog.exec()
+            self.config_window.pick_color(key, color, opacity, save)
 
-        self.widget_updates.append(update)
+        self.config_window.subscribe(key, update)
 
         button.clicked.connect(lambda _: open_color_dialog())
 
@@ -453,7 +620,7 @@ class ConfigLayout(QBoxLayout):
                 self.conf.set(key, path)
                 update()
 
-        self.widget_updates.append(update)
+        self.config_window.subscribe(key, update)
         button.clicked.connect(get_path)
 
         return (line_edit, button)
@@ -474,7 +641,7 @@ class ConfigLayout(QBoxLayout):
             val = val.replace(" ", "")
             edit.setKeySequence(val)
 
-        self.widget_updates.append(update)
+        self.config_window.subscribe(key, update)
 
         edit.keySequenceChanged.connect(  # type: ignore
             lambda s: self.conf.set(key, edit.keySequence().toString())
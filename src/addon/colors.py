@@ -1,5 +1,7 @@
-from typing import Any, Optional, Tuple, List, Dict
-import re
+from typing import Any, Callable, NamedTuple, Optional, Tuple, List, Dict
+from pathlib import Path
+import json
+import time
 
 from anki.hooks import wrap
 import aqt
@@ -10,9 +12,15 @@ from aqt.theme import theme_manager
 from aqt.qt import QColor, QPalette, Qt
 from anki.utils import is_mac
 
-from .ankiaddonconfig import ConfigManager
-
-conf = ConfigManager()
+from . import conf, diagnostics, rgba
+from .compiler import (
+    CompiledTheme,
+    colors_hash,
+    compile_theme,
+    diff_payload,
+    css_name_list,
+)
+from .webviews import WebviewRegistry
 
 # Sourced from aqt.browser.table.backend_color_to_aqt_color
 # ACCENT_CARD and ACCENT_NOTE are passed to ThemeManager.qcolor, which doesn't support #RGBA
@@ -31,50 +39,109 @@ ARGB_ONLY_ENTRIES = (
     "ACCENT_NOTE"
 )
 
+# Hash of the colors that were last applied to aqt.colors and the Qt palette
+_applied_qt_hash: Optional[str] = None
+# The aqt.colors values that were last applied, see anki_color_overrides()
+_applied_anki_colors: Dict[str, List[str]] = {}
+
+
+def qt_colors_hash(color_entries: Dict[str, List[str]]) -> str:
+    "Hash of the colors that are used by Qt, ignoring the webview-only ones"
+    qt_colors = {
+        name: [entry[1], entry[2]]
+        for name, entry in color_entries.items()
+        if name == "BUTTON_HOVER" or getattr(aqt.colors, name, None) is not None
+    }
+    return colors_hash(qt_colors)
+
+
 # ReColor Python Colors
-def recolor_python() -> None:
-    conf.load()
+def recolor_python(force: bool = False) -> None:
+    """Applies the colors to aqt.colors and restyles Qt.
+    Skipped if the Qt colors didn't change since the last time, unless force is True."""
+    global _applied_qt_hash, _applied_anki_colors
+    compiled_theme()  # reloads conf if the compiled theme is out of date
     color_entries = conf.get("colors")
-    for color_name in color_entries:
-        replace_color(color_entries, color_name)
-    replace_color(color_entries, "BUTTON_GRADIENT_START", "BUTTON_HOVER")
-    replace_color(color_entries, "BUTTON_GRADIENT_END", "BUTTON_HOVER")
-    # theme_manager.apply_style() doesn't have an effect in 2.1.57+ if the theme and widget style didn't change,
-    # so we call the private functions directly
-    theme_manager._apply_palette(aqt.mw.app)
-    theme_manager._apply_style(aqt.mw.app)
-    _apply_style()
-
-
-def hex_with_alpha_to_rgba(hex_color: str) -> str:
-    """Convert CSS's eight-value syntax to rgba to work with Qt stylesheets"""
-    if hex_color.startswith("#") and len(hex_color) == 9:
-        color = hex_color.strip("#")
-        red = int(color[0:2], 16)
-        green = int(color[2:4], 16)
-        blue = int(color[4:6], 16)
-        alpha = round(int(color[6:8], 16) / 255, 2)
-        return f"rgba({red}, {green}, {blue}, {alpha})"
-    return hex_color
-
-
-RGBA_RE = re.compile(r"\((\d+),\s*(\d+),\s*(\d+),\s*(\d+\.*\d+?)\)\s*")
-
-def hex_with_alpha_to_argb(hex_color: str) -> str:
-    # ARGB_ONLY_ENTRIES get passed directly into a QColor, so they need to be of RGB hex format
-    # QColor also takes #ARGB, so prepend the alpha instead of removing it (https://doc.qt.io/qt-6/qcolor.html#fromString)
-    if hex_color.startswith("#") and len(hex_color) == 9:
-        # assume #RGBA, convert to #ARGB
-        return "#" + hex_color[7:9] + hex_color[1:7]
-    elif hex_color.startswith("rgba") and (m := re.match(RGBA_RE, hex_color[4:])):
-        # convert rgba(...) to #ARGB
-        r = int(m.group(1))
-        g = int(m.group(2))
-        b = int(m.group(3))
-        a = int(255 * float(m.group(4)))
-        return f"#{a:02x}{r:02x}{g:02x}{b:02x}"
-    # fallback to original
-    return hex_color
+    qt_hash = qt_colors_hash(color_entries)
+    if qt_hash == _applied_qt_hash and not force:
+        return
+    if qt_hash != _applied_qt_hash:
+        _mode_styles.clear()
+    _applied_qt_hash = qt_hash
+    with diagnostics.stage("replace_color loop") as stage:
+        _applied_anki_colors = anki_color_overrides(color_entries)
+        apply_anki_colors(_applied_anki_colors)
+        stage.note(colors=len(color_entries))
+    # Resolve both modes now, so switching between light and dark mode is instant
+    mode_style(False)
+    mode_style(True)
+    apply_qt_style()
+
+
+class StylePassReport(NamedTuple):
+    seconds: float
+    # Number of widgets that were repolished
+    widgets: int
+
+
+last_style_pass: Optional[StylePassReport] = None
+
+
+def apply_qt_style() -> None:
+    """Applies the palette and Anki's stylesheet in a single pass.
+
+    theme_manager._apply_palette() is skipped, as its palette would be replaced by ours right away.
+    Repainting is paused until both are applied, so the widgets are only repainted once.
+    """
+    global last_style_pass
+    app = mw.app
+    start = time.perf_counter()
+    windows = [w for w in app.topLevelWidgets() if w.isVisible() and w.updatesEnabled()]
+    for window in windows:
+        window.setUpdatesEnabled(False)
+    try:
+        # theme_manager.apply_style() doesn't have an effect in 2.1.57+ if the theme and widget style didn't change,
+        # so we call the private function directly
+        theme_manager._apply_style(app)
+        # Set last, as _apply_style() may change the app style which can reset the palette
+        app.setPalette(mode_style().palette)
+    finally:
+        for window in windows:
+            window.setUpdatesEnabled(True)
+    last_style_pass = StylePassReport(
+        seconds=time.perf_counter() - start, widgets=len(app.allWidgets())
+    )
+    diagnostics.record(
+        "style pass", last_style_pass.seconds, detail={"widgets": last_style_pass.widgets}
+    )
+
+
+def anki_color_format(anki_name: str) -> Callable[[str], str]:
+    "Converts a config color to the format the aqt.colors entry is read in"
+    if anki_name in ARGB_ONLY_ENTRIES:
+        return rgba.to_qt_argb
+    return rgba.to_css_rgba
+
+
+def anki_color_overrides(color_entries: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    "aqt.colors name -> [light, dark] of the config colors, in the format aqt reads them"
+    sources = {name: name for name in color_entries}
+    sources["BUTTON_GRADIENT_START"] = "BUTTON_HOVER"
+    sources["BUTTON_GRADIENT_END"] = "BUTTON_HOVER"
+    overrides = {}
+    for anki_name, addon_name in sources.items():
+        if getattr(aqt.colors, anki_name, None) is not None:
+            color_entry = color_entries[addon_name]
+            color_map_fn = anki_color_format(anki_name)
+            overrides[anki_name] = [color_map_fn(color_entry[1]), color_map_fn(color_entry[2])]
+    return overrides
+
+
+def apply_anki_colors(overrides: Dict[str, List[str]]) -> None:
+    for anki_name, (light, dark) in overrides.items():
+        anki_color = getattr(aqt.colors, anki_name)
+        anki_color["light"] = light
+        anki_color["dark"] = dark
 
 
 def replace_color(
@@ -86,58 +153,85 @@ def replace_color(
         addon_name = anki_name
     if (anki_color := getattr(aqt.colors, anki_name, None)) is not None:
         color_entry = color_entries[addon_name]
-        color_map_fn = hex_with_alpha_to_rgba if anki_name not in ARGB_ONLY_ENTRIES else hex_with_alpha_to_argb
+        color_map_fn = anki_color_format(anki_name)
         anki_color["light"] = color_map_fn(color_entry[1])
         anki_color["dark"] = color_map_fn(color_entry[2])
         setattr(aqt.colors, anki_name, anki_color)
 
 
-def get_window_bg_color(*args: Any) -> QColor:
-    color_idx = 2 if theme_manager.night_mode else 1
-    hex_color = conf.get(f"colors.CANVAS.{color_idx}")
-    return QColor(hex_color)
+def get_window_bg_color(*args: Any, **kwargs: Any) -> QColor:
+    """Replaces AnkiWebView.get_window_bg_color(self, night_mode=None), which runs for every new webview.
+    Returns a copy of the canvas color resolved in mode_style()."""
+    night_mode = args[1] if len(args) > 1 else kwargs.get("night_mode")
+    return QColor(mode_style(night_mode).canvas)
 
 
 def replace_webview_bg() -> None:
     AnkiWebView.get_window_bg_color = get_window_bg_color  # type: ignore
 
 
+# aqt.colors entries that _apply_style() puts in the palette
+PALETTE_ENTRIES = frozenset(
+    (
+        "FG",
+        "HIGHLIGHT_BG",
+        "HIGHLIGHT_FG",
+        "CANVAS",
+        "BUTTON_BG",
+        "CANVAS_CODE",
+        "FG_SUBTLE",
+        "FG_DISABLED",
+        "FG_LINK",
+    )
+)
+
+
 def _apply_style() -> None:
     """
     Used because Anki doesn't style palette in MacOS.
+    Builds the palette from the current aqt.colors, see mode_style() for the cached version.
+    """
+    mw.app.setPalette(build_palette(theme_manager.night_mode))
+
+
+def qcolor(anki_color: Dict[str, str], night_mode: bool) -> QColor:
+    "Like theme_manager.qcolor(), but for either mode"
+    return QColor(rgba.to_qt_argb(anki_color["dark" if night_mode else "light"]))
 
-    Mostly identical to aqt.theme_manager._apply_style
+
+def build_palette(night_mode: bool) -> QPalette:
+    """
+    Mostly identical to aqt.theme_manager._apply_palette
     changed Button color to BUTTON_BG from BUTTON_GRADIENT_START
     """
-    manager = theme_manager
     palette = QPalette()
-    text = manager.qcolor(aqt.colors.FG)
+    text = qcolor(aqt.colors.FG, night_mode)
     palette.setColor(QPalette.ColorRole.WindowText, text)
     palette.setColor(QPalette.ColorRole.ToolTipText, text)
     palette.setColor(QPalette.ColorRole.Text, text)
     palette.setColor(QPalette.ColorRole.ButtonText, text)
 
-    hlbg = manager.qcolor(aqt.colors.HIGHLIGHT_BG)
+    hlbg = qcolor(aqt.colors.HIGHLIGHT_BG, night_mode)
     palette.setColor(
-        QPalette.ColorRole.HighlightedText, manager.qcolor(aqt.colors.HIGHLIGHT_FG)
+        QPalette.ColorRole.HighlightedText, qcolor(aqt.colors.HIGHLIGHT_FG, night_mode)
     )
     palette.setColor(QPalette.ColorRole.Highlight, hlbg)
 
-    canvas = manager.qcolor(aqt.colors.CANVAS)
+    canvas = qcolor(aqt.colors.CANVAS, night_mode)
     palette.setColor(QPalette.ColorRole.Window, canvas)
     palette.setColor(QPalette.ColorRole.AlternateBase, canvas)
 
-    palette.setColor(QPalette.ColorRole.Button, manager.qcolor(aqt.colors.BUTTON_BG))
+    palette.setColor(QPalette.ColorRole.Button, qcolor(aqt.colors.BUTTON_BG, night_mode))
 
-    input_base = manager.qcolor(aqt.colors.CANVAS_CODE)
+    input_base = qcolor(aqt.colors.CANVAS_CODE, night_mode)
     palette.setColor(QPalette.ColorRole.Base, input_base)
     palette.setColor(QPalette.ColorRole.ToolTipBase, input_base)
 
     palette.setColor(
-        QPalette.ColorRole.PlaceholderText, manager.qcolor(aqt.colors.FG_SUBTLE)
+        QPalette.ColorRole.PlaceholderText, qcolor(aqt.colors.FG_SUBTLE, night_mode)
     )
 
-    disabled_color = manager.qcolor(aqt.colors.FG_DISABLED)
+    disabled_color = qcolor(aqt.colors.FG_DISABLED, night_mode)
     palette.setColor(
         QPalette.ColorGroup.Disabled, QPalette.ColorRole.Text, disabled_color
     )
@@ -150,11 +244,39 @@ def _apply_style() -> None:
         disabled_color,
     )
 
-    palette.setColor(QPalette.ColorRole.Link, manager.qcolor(aqt.colors.FG_LINK))
+    palette.setColor(QPalette.ColorRole.Link, qcolor(aqt.colors.FG_LINK, night_mode))
 
     palette.setColor(QPalette.ColorRole.BrightText, Qt.GlobalColor.red)
 
-    mw.app.setPalette(palette)
+    return palette
+
+
+class ModeStyle(NamedTuple):
+    "The resolved Qt colors of one mode"
+    palette: QPalette
+    canvas: QColor
+
+
+# night mode -> ModeStyle of the applied colors
+_mode_styles: Dict[bool, ModeStyle] = {}
+
+
+def mode_style(night_mode: Optional[bool] = None) -> ModeStyle:
+    "Defaults to the current mode. Built once per applied colors and mode."
+    if night_mode is None:
+        night_mode = theme_manager.night_mode
+    if (style := _mode_styles.get(night_mode)) is None:
+        style = _mode_styles[night_mode] = ModeStyle(
+            palette=build_palette(night_mode),
+            canvas=qcolor(aqt.colors.CANVAS, night_mode),
+        )
+    return style
+
+
+def on_theme_did_change() -> None:
+    """Anki has applied its own palette for the new mode by now.
+    Both modes are resolved in advance, so this doesn't read the config or parse colors."""
+    mw.app.setPalette(mode_style().palette)
 
 
 # ReColor CSS Colors
@@ -164,107 +286,185 @@ def wrap_style(css: str) -> str:
     return f"<style>{css}</style>"
 
 
+_compiled_theme: Optional[CompiledTheme] = None
+_compiled_theme_stale = True
+
+
+def compiled_theme() -> CompiledTheme:
+    """Returns the compiled theme of the saved config, only touching the config after invalidate_compiled_theme()."""
+    global _compiled_theme, _compiled_theme_stale
+    if _compiled_theme is None or _compiled_theme_stale:
+        with diagnostics.stage("config load"):
+            if conf.dirty:
+                # Reloading would discard the unsaved changes of the config window
+                colors_config = mw.addonManager.getConfig(conf.addon_dir)["colors"]
+            else:
+                conf.load()
+                colors_config = conf.get_copy("colors")
+        config_hash = colors_hash(colors_config)
+        if _compiled_theme is None or _compiled_theme.config_hash != config_hash:
+            with diagnostics.stage("css compile"):
+                _compiled_theme = compile_theme(colors_config)
+        _compiled_theme_stale = False
+    return _compiled_theme
+
+
+def invalidate_compiled_theme() -> None:
+    """Call when the saved config may have changed. The theme is recompiled lazily, if its hash changed."""
+    global _compiled_theme_stale
+    _compiled_theme_stale = True
+
+
 def get_theme_css() -> Tuple[str, str, str]:
-    conf.load()
-    colors_config = conf["colors"]
-
-    light_mode_css = ""
-    dark_mode_css = ""
-    for name in colors_config:
-        entry = colors_config[name]
-        css_names = entry[3]
-        if not isinstance(css_names, list):
-            css_names = [css_names]
-        for css_name in css_names:
-            light_mode_css += f"{css_name}: {entry[1]};\n"
-            dark_mode_css += f"{css_name}: {entry[2]};\n"
-
-    extra_css = """
-html button {
-    background: var(--button-bg);
-}
-.night-mode .isMac button {
-    --canvas: %s; 
-    --fg: %s; 
-}
-""" % (
-        conf["colors.BUTTON_BG.2"],
-        conf["colors.FG.2"],
-    )
+    theme = compiled_theme()
+    return (theme.light_css, theme.dark_css, theme.extra_css)
+
 
-    return (light_mode_css, dark_mode_css, extra_css)
+# Defines window.ReColor in the page, see recolor.js
+RUNTIME_JS = (Path(__file__).parent / "recolor.js").read_text()
 
 
 def inject_web(web_content: aqt.webview.WebContent, context: Optional[Any]) -> None:
-    (light_mode_css, dark_mode_css, extra_css) = get_theme_css()
-    web_content.head += (
-        "<style id='recolor-light'>body { \n%s }</style>" % light_mode_css
-    )
-    web_content.head += (
-        "<style id='recolor-dark'>body.night_mode { \n%s }</style>" % dark_mode_css
-    )
-    web_content.head += "<style id='recolor-extra'>%s</style>" % extra_css
+    with diagnostics.stage("inject_web") as stage:
+        (light_mode_css, dark_mode_css, extra_css) = get_theme_css()
+        web_content.head += (
+            "<style id='recolor-light'>body { \n%s }</style>" % light_mode_css
+        )
+        web_content.head += (
+            "<style id='recolor-dark'>body.night_mode { \n%s }</style>" % dark_mode_css
+        )
+        web_content.head += "<style id='recolor-extra'>%s</style>" % extra_css
+        web_content.head += "<script>%s</script>" % RUNTIME_JS
+        stage.note(page=type(context).__name__)
+    add_page_theme(compiled_theme())
+
 
 def inject_web_ts(webview: AnkiWebView) -> None:
-    (light_mode_css, dark_mode_css, extra_css) = get_theme_css()
-
-    styles = """
-    <style id='recolor-light'>body { \n%s }</style>
-    <style id='recolor-dark'>body.night_mode { \n%s }</style>
-    <style id='recolor-extra'>%s</style>
-    """ % (light_mode_css, dark_mode_css, extra_css)
-
-    webview.eval(
-        f"""(() => {{
-            document.head.innerHTML += `{styles}`;
-        }})()"""
-    )
+    # Reuses the recolor style nodes if they exist, so this is safe to run more than once per page
+    with diagnostics.stage("inject_web_ts") as stage:
+        theme = compiled_theme()
+        webview.eval(RUNTIME_JS + update_css_js(theme.js_payload))
+        add_page_theme(theme)
+        stage.note(webview=getattr(webview, "title", ""))
+
 
+_recolor_web_pending = False
+# Config hash -> theme, of every theme the open webviews may be colored with.
+# Pages rendered after the config changed, but before the next update, have the new theme.
+_page_themes: Dict[str, CompiledTheme] = {}
 
-webviews: List[AnkiWebView] = []
+
+def add_page_theme(theme: CompiledTheme) -> None:
+    _page_themes[theme.config_hash] = theme
 
 
 def recolor_web() -> None:
-    global webviews
-    for webview in webviews:
-        update_webview_css(webview)
+    """Schedules a css update of every webview.
+    Calls made in the same event loop turn are merged into a single update."""
+    global _recolor_web_pending
+    if _recolor_web_pending:
+        return
+    _recolor_web_pending = True
+    mw.progress.single_shot(0, _flush_recolor_web, False)
+
+
+def _flush_recolor_web() -> None:
+    global _recolor_web_pending, _page_themes
+    _recolor_web_pending = False
+    theme = compiled_theme()
+    page_themes, _page_themes = _page_themes, {theme.config_hash: theme}
+    # Only send the css variables that changed since the last update,
+    # unless the pages may be colored with different themes
+    old = next(iter(page_themes.values())) if len(page_themes) == 1 else None
+    payload = diff_payload(old, theme)
+    if payload is None:
+        return
+    # Hidden webviews are caught up with update_webview_css() once they are shown again
+    webviews.broadcast(update_css_js(payload))
+
+
+def update_css_js(payload: str) -> str:
+    return "window.ReColor && ReColor.update(%s);" % payload
 
 
 def update_webview_css(webview: AnkiWebView) -> None:
-    (light_mode_css, dark_mode_css, extra_css) = get_theme_css()
-    webview.eval(
-        "document.getElementById('recolor-light').innerHTML = `body { \n%s }`"
-        % light_mode_css
-    )
-    webview.eval(
-        "document.getElementById('recolor-dark').innerHTML = `body.night_mode { \n%s }`"
-        % dark_mode_css
-    )
-    webview.eval(
-        "document.getElementById('recolor-extra').innerHTML = `%s`" % extra_css
-    )
+    with diagnostics.stage("webview catch-up"):
+        theme = compiled_theme()
+        webview.eval(update_css_js(theme.js_payload))
+        add_page_theme(theme)
+
+
+webviews = WebviewRegistry(update_webview_css)
+
+
+# Live preview
+
+_previewed: Dict[str, List[str]] = {}
+
+
+def preview_color(name: str, color_idx: int, value: str) -> None:
+    """Shows an unsaved color in the visible webviews and the Qt palette.
+    Only that color's css variables are sent. Undo with end_preview()."""
+    css_names = conf.get(f"colors.{name}.3")
+    if css_names is None:
+        return
+    _previewed[name] = css_name_list(css_names)
+    mode = "dark" if color_idx == 2 else "light"
+    payload = json.dumps({mode: {css_name: value for css_name in _previewed[name]}})
+    webviews.broadcast(update_css_js(payload))
+
+    if (anki_color := getattr(aqt.colors, name, None)) is not None:
+        anki_color[mode] = anki_color_format(name)(value)
+        if name in PALETTE_ENTRIES and (color_idx == 2) == theme_manager.night_mode:
+            _apply_style()
+
+
+def end_preview() -> None:
+    """Restores the colors changed by preview_color() to the applied colors.
+    The config may still hold the unsaved colors, so they are taken from the applied theme and aqt.colors values."""
+    if not _previewed:
+        return
+    theme = compiled_theme()
+    restore: Dict[str, Dict[str, str]] = {"light": {}, "dark": {}}
+    for name, css_names in _previewed.items():
+        if name in _applied_anki_colors:
+            light, dark = _applied_anki_colors[name]
+            anki_color = getattr(aqt.colors, name)
+            anki_color["light"] = light
+            anki_color["dark"] = dark
+        for css_name in css_names:
+            if css_name in theme.light_vars:
+                restore["light"][css_name] = theme.light_vars[css_name]
+            if css_name in theme.dark_vars:
+                restore["dark"][css_name] = theme.dark_vars[css_name]
+    webviews.broadcast(update_css_js(json.dumps(restore)))
+    if PALETTE_ENTRIES.intersection(_previewed):
+        # aqt.colors is back to the applied colors
+        mw.app.setPalette(mode_style().palette)
+    _previewed.clear()
 
 
 def on_webview_init(webview: AnkiWebView, *args: Any, **kwargs: Any) -> None:
-    global webviews
-    webviews.append(webview)
+    webviews.add(webview)
 
 
 def on_webview_cleanup(webview: AnkiWebView) -> None:
-    global webviews
-    webviews.remove(webview)
+    webviews.discard(webview)
 
 
 if mw.web:
-    webviews.append(mw.web)
+    webviews.add(mw.web)
 if mw.toolbarWeb:
-    webviews.append(mw.toolbarWeb)
+    webviews.add(mw.toolbarWeb)
 if mw.bottomWeb:
-    webviews.append(mw.bottomWeb)
+    webviews.add(mw.bottomWeb)
 
 
-AnkiWebView.__init__ = wrap(AnkiWebView.__init__, on_webview_init, "before")  # type: ignore
+# "after", as the registry needs the QObject to be initialized
+AnkiWebView.__init__ = wrap(AnkiWebView.__init__, on_webview_init, "after")  # type: ignore
 AnkiWebView.cleanup = wrap(AnkiWebView.cleanup, on_webview_cleanup, "before")  # type: ignore
 gui_hooks.webview_will_set_content.append(inject_web)
 gui_hooks.webview_did_inject_style_into_page.append(inject_web_ts)
+gui_hooks.theme_did_change.append(on_theme_did_change)
+replace_webview_bg()
 recolor_python()
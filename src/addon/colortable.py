@@ -0,0 +1,313 @@
+"""The colors tab: a table of every config color with both modes side by side.
+
+Swatches are painted by a delegate, so a row costs no widgets or stylesheets.
+"""
+
+from typing import Any, Collection, Dict, List, Optional, Tuple
+
+import aqt.colors
+from aqt.qt import *
+
+from .ankiaddonconfig import ConfigLayout, ConfigManager, ConfigWindow
+from .ankiaddonconfig.window import str_to_qcolor
+from .compiler import css_name_list
+
+COLUMNS = ("Name", "Light", "Dark", "CSS variable", "Description")
+NAME, LIGHT, DARK, CSS, DESCRIPTION = range(len(COLUMNS))
+# Column -> index of the color in a config color entry
+MODE_IDX = {LIGHT: 1, DARK: 2}
+
+# The QColor of a light or dark cell, None if the value isn't a color Qt can show
+COLOR_ROLE = Qt.ItemDataRole.UserRole
+# Colors sort by lightness, text case insensitively
+SORT_ROLE = Qt.ItemDataRole.UserRole + 1
+
+SWATCH_WIDTH = 36
+ROW_HEIGHT = 26
+
+
+class _Row:
+    __slots__ = ("key", "values", "colors")
+
+    def __init__(self, key: str, values: Tuple[str, ...]) -> None:
+        self.key = key
+        # Text of each column
+        self.values = values
+        self.colors = {column: str_to_qcolor(values[column]) for column in MODE_IDX}
+
+
+def _row_values(key: str, entry: Any) -> Tuple[str, ...]:
+    anki_color = getattr(aqt.colors, key, None)
+    description = anki_color.get("comment", "") if anki_color is not None else ""
+    return (
+        str(entry[0]),
+        str(entry[1]),
+        str(entry[2]),
+        ", ".join(css_name_list(entry[3])),
+        description,
+    )
+
+
+class ColorTableModel(QAbstractTableModel):
+    """The "colors" config dict, one row per color.
+    Call sync() after the config was changed elsewhere."""
+
+    # config key, value. Emitted when a color is edited through the model.
+    color_edited = pyqtSignal(str, str)
+
+    def __init__(self, conf: ConfigManager, parent: Optional[QObject] = None) -> None:
+        QAbstractTableModel.__init__(self, parent)
+        self.conf = conf
+        self._rows: List[_Row] = self._read_rows()
+
+    def _read_rows(self) -> List[_Row]:
+        return [
+            _Row(key, _row_values(key, entry))
+            for key, entry in self.conf["colors"].items()
+        ]
+
+    def key(self, row: int) -> str:
+        return self._rows[row].key
+
+    def keys(self) -> List[str]:
+        return [row.key for row in self._rows]
+
+    def sync(self) -> None:
+        "Reads the config again, only signalling the rows that changed"
+        entries = self.conf["colors"]
+        if list(entries) != self.keys():
+            self.beginResetModel()
+            self._rows = self._read_rows()
+            self.endResetModel()
+            return
+        for i, row in enumerate(self._rows):
+            values = _row_values(row.key, entries[row.key])
+            if values != row.values:
+                self._rows[i] = _Row(row.key, values)
+                self.dataChanged.emit(self.index(i, 0), self.index(i, len(COLUMNS) - 1))
+
+    def set_color(self, row: int, column: int, value: str) -> bool:
+        "Sets the light or dark color of a row. Returns False if value isn't a color."
+        value = value.strip()
+        if column not in MODE_IDX or not str_to_qcolor(value).isValid():
+            return False
+        old = self._rows[row]
+        values = old.values[:column] + (value,) + old.values[column + 1 :]
+        self._rows[row] = _Row(old.key, values)
+        key = f"colors.{old.key}.{MODE_IDX[column]}"
+        self.conf.set(key, value)
+        self.dataChanged.emit(self.index(row, column), self.index(row, column))
+        self.color_edited.emit(key, value)
+        return True
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        column = index.column()
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return row.values[column]
+        if role == COLOR_ROLE:
+            color = row.colors.get(column)
+            return color if color is not None and color.isValid() else None
+        if role == SORT_ROLE:
+            if column in MODE_IDX:
+                color = row.colors[column]
+                return color.lightnessF() if color.isValid() else -1.0
+            return row.values[column].lower()
+        if role == Qt.ItemDataRole.ToolTipRole:
+            if column == NAME:
+                return row.key
+            if column == DESCRIPTION:
+                return row.values[DESCRIPTION]
+        return None
+
+    def headerData(
+        self,
+        section: int,
+        orientation: Qt.Orientation,
+        role: int = Qt.ItemDataRole.DisplayRole,
+    ) -> Any:
+        if (
+            orientation == Qt.Orientation.Horizontal
+            and role == Qt.ItemDataRole.DisplayRole
+        ):
+            return COLUMNS[section]
+        return None
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlag:
+        flags = Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+        if index.column() in MODE_IDX:
+            flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    def setData(
+        self, index: QModelIndex, value: Any, role: int = Qt.ItemDataRole.EditRole
+    ) -> bool:
+        if not index.isValid() or role != Qt.ItemDataRole.EditRole:
+            return False
+        return self.set_color(index.row(), index.column(), str(value))
+
+
+class ColorFilterModel(QSortFilterProxyModel):
+    "Filters by text in any column, and optionally by a set of color keys"
+
+    def __init__(self, model: ColorTableModel, parent: Optional[QObject] = None) -> None:
+        QSortFilterProxyModel.__init__(self, parent)
+        self.model = model
+        self.setSourceModel(model)
+        self._keys: Optional[Collection[str]] = None
+        self.setFilterKeyColumn(-1)
+        self.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.setSortRole(SORT_ROLE)
+
+    def set_keys(self, keys: Optional[Collection[str]]) -> None:
+        self._keys = set(keys) if keys is not None else None
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:
+        if self._keys is not None:
+            if self.model.key(source_row) not in self._keys:
+                return False
+        return QSortFilterProxyModel.filterAcceptsRow(self, source_row, source_parent)
+
+
+_checkerboard: Optional[QBrush] = None
+
+
+def checkerboard() -> QBrush:
+    "Background for translucent swatches"
+    global _checkerboard
+    if _checkerboard is None:
+        pixmap = QPixmap(8, 8)
+        pixmap.fill(QColor("#ffffff"))
+        painter = QPainter(pixmap)
+        painter.fillRect(0, 0, 4, 4, QColor("#cccccc"))
+        painter.fillRect(4, 4, 4, 4, QColor("#cccccc"))
+        painter.end()
+        _checkerboard = QBrush(pixmap)
+    return _checkerboard
+
+
+class SwatchDelegate(QStyledItemDelegate):
+    "Paints a color cell as a swatch followed by the color string"
+
+    def paint(
+        self, painter: QPainter, option: QStyleOptionViewItem, index: QModelIndex
+    ) -> None:
+        color = index.data(COLOR_ROLE)
+        if color is None:
+            QStyledItemDelegate.paint(self, painter, option, index)
+            return
+        opt = QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        text = opt.text
+        opt.text = ""
+        widget = opt.widget
+        style = widget.style() if widget is not None else QApplication.style()
+        # Background and selection
+        style.drawControl(QStyle.ControlElement.CE_ItemViewItem, opt, painter, widget)
+
+        rect = opt.rect.adjusted(4, 4, -4, -4)
+        swatch = QRect(rect.left(), rect.top(), SWATCH_WIDTH, rect.height())
+        painter.save()
+        if color.alpha() < 255:
+            painter.fillRect(swatch, checkerboard())
+        painter.fillRect(swatch, color)
+        painter.setPen(opt.palette.color(QPalette.ColorRole.Mid))
+        painter.drawRect(swatch.adjusted(0, 0, -1, -1))
+        if opt.state & QStyle.StateFlag.State_Selected:
+            painter.setPen(opt.palette.color(QPalette.ColorRole.HighlightedText))
+        else:
+            painter.setPen(opt.palette.color(QPalette.ColorRole.Text))
+        painter.drawText(
+            rect.adjusted(SWATCH_WIDTH + 6, 0, 0, 0),
+            Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft,
+            text,
+        )
+        painter.restore()
+
+
+def color_table(
+    conf_window: ConfigWindow,
+    layout: ConfigLayout,
+    categories: Dict[str, List[str]],
+) -> None:
+    """Adds a filter bar and the color table to layout.
+    Double clicking a color opens a color dialog, typing edits the color string."""
+    model = ColorTableModel(conf_window.conf, conf_window)
+    proxy = ColorFilterModel(model, conf_window)
+
+    filter_lay = layout.hlayout()
+    category_box = QComboBox(conf_window)
+    category_box.addItem("All colors")
+    category_box.addItems(list(categories))
+    filter_lay.addWidget(category_box)
+    filter_edit = QLineEdit(conf_window)
+    filter_edit.setPlaceholderText("Filter")
+    filter_edit.setClearButtonEnabled(True)
+    filter_lay.addWidget(filter_edit)
+
+    def on_category(index: int) -> None:
+        proxy.set_keys(categories[category_box.itemText(index)] if index else None)
+
+    category_box.currentIndexChanged.connect(on_category)
+    filter_edit.textChanged.connect(proxy.setFilterFixedString)
+
+    view = QTableView(conf_window)
+    view.setModel(proxy)
+    delegate = SwatchDelegate(view)
+    for column in MODE_IDX:
+        view.setItemDelegateForColumn(column, delegate)
+    # Config order until a header is clicked
+    view.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+    view.setSortingEnabled(True)
+    view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectItems)
+    view.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+    view.setEditTriggers(
+        QAbstractItemView.EditTrigger.EditKeyPressed
+        | QAbstractItemView.EditTrigger.AnyKeyPressed
+    )
+    view.setWordWrap(False)
+    # Fixed sizes, so Qt doesn't measure every row
+    vheader = view.verticalHeader()
+    vheader.setVisible(False)
+    vheader.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+    vheader.setDefaultSectionSize(ROW_HEIGHT)
+    hheader = view.horizontalHeader()
+    hheader.setStretchLastSection(True)
+    for column, width in ((NAME, 170), (LIGHT, 125), (DARK, 125), (CSS, 150)):
+        view.setColumnWidth(column, width)
+    view.setMinimumHeight(300)
+    layout.addWidget(view)
+
+    def on_double_click(proxy_index: QModelIndex) -> None:
+        index = proxy.mapToSource(proxy_index)
+        row, column = index.row(), index.column()
+        if column not in MODE_IDX:
+            return
+        color = index.data(COLOR_ROLE)
+
+        def save(value: str) -> None:
+            model.set_color(row, column, value)
+
+        conf_window.pick_color(
+            f"colors.{model.key(row)}.{MODE_IDX[column]}",
+            color if color is not None else QColor(),
+            True,
+            save,
+        )
+
+    def preview(key: str, value: str) -> None:
+        for hook in conf_window.color_preview_hook:
+            hook(key, value)
+
+    view.doubleClicked.connect(on_double_click)
+    model.color_edited.connect(preview)
+    conf_window.subscribe("colors", model.sync)
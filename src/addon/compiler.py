@@ -0,0 +1,109 @@
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+import hashlib
+import json
+
+
+class CompiledTheme(NamedTuple):
+    """Everything the webviews need from the "colors" config, built once per config change."""
+
+    config_hash: str
+    light_vars: Dict[str, str]
+    dark_vars: Dict[str, str]
+    light_css: str
+    dark_css: str
+    extra_css: str
+    # JSON: {"light": {css_var: value}, "dark": {css_var: value}, "extra": extra_css}
+    js_payload: str
+
+
+def colors_hash(colors_config: Dict[str, Any]) -> str:
+    dumped = json.dumps(colors_config, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(dumped.encode("utf-8")).hexdigest()
+
+
+def css_name_list(css_names: Union[str, List[str]]) -> List[str]:
+    "A color entry's 4th value is either a single css variable name or a list of them"
+    if isinstance(css_names, str):
+        return [css_names]
+    return list(css_names)
+
+
+def css_variables(colors_config: Dict[str, Any], color_idx: int) -> Dict[str, str]:
+    variables = {}
+    for name in colors_config:
+        entry = colors_config[name]
+        for css_name in css_name_list(entry[3]):
+            variables[css_name] = entry[color_idx]
+    return variables
+
+
+def variables_to_css(variables: Dict[str, str]) -> str:
+    return "".join(f"{name}: {value};\n" for name, value in variables.items())
+
+
+def compile_extra_css(colors_config: Dict[str, Any]) -> str:
+    return """
+html button {
+    background: var(--button-bg);
+}
+.night-mode .isMac button {
+    --canvas: %s;
+    --fg: %s;
+}
+""" % (
+        colors_config["BUTTON_BG"][2],
+        colors_config["FG"][2],
+    )
+
+
+def compile_theme(colors_config: Dict[str, Any]) -> CompiledTheme:
+    light_vars = css_variables(colors_config, 1)
+    dark_vars = css_variables(colors_config, 2)
+    extra_css = compile_extra_css(colors_config)
+    js_payload = json.dumps(
+        {"light": light_vars, "dark": dark_vars, "extra": extra_css},
+        separators=(",", ":"),
+    )
+    return CompiledTheme(
+        config_hash=colors_hash(colors_config),
+        light_vars=light_vars,
+        dark_vars=dark_vars,
+        light_css=variables_to_css(light_vars),
+        dark_css=variables_to_css(dark_vars),
+        extra_css=extra_css,
+        js_payload=js_payload,
+    )
+
+
+def diff_variables(
+    old: Dict[str, str], new: Dict[str, str]
+) -> Dict[str, Optional[str]]:
+    "Changed and added variables, and removed ones mapped to None"
+    diff: Dict[str, Optional[str]] = {
+        name: value for name, value in new.items() if old.get(name) != value
+    }
+    for name in old:
+        if name not in new:
+            diff[name] = None
+    return diff
+
+
+def diff_payload(old: Optional[CompiledTheme], new: CompiledTheme) -> Optional[str]:
+    """JSON payload for ReColor.update() that turns a page colored with `old` into `new`.
+    Returns None if nothing changed."""
+    if old is None:
+        return new.js_payload
+    if old.config_hash == new.config_hash:
+        return None
+    payload: Dict[str, Any] = {}
+    light = diff_variables(old.light_vars, new.light_vars)
+    if light:
+        payload["light"] = light
+    dark = diff_variables(old.dark_vars, new.dark_vars)
+    if dark:
+        payload["dark"] = dark
+    if old.extra_css != new.extra_css:
+        payload["extra"] = new.extra_css
+    if not payload:
+        return None
+    return json.dumps(payload, separators=(",", ":"))
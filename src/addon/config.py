@@ -1,21 +1,21 @@
-from typing import Any, List
+from typing import Any, Dict, List
 from pathlib import Path
-import json
 
-from aqt import colors
 from aqt.qt import *
 from aqt.utils import openLink, tooltip
-from aqt.theme import theme_manager
 
+from . import conf, diagnostics, themes
 from .ankiaddonconfig import ConfigManager, ConfigWindow, ConfigLayout
-from .colors import recolor_python, recolor_web
+from .colortable import color_table
+from .colors import (
+    end_preview,
+    invalidate_compiled_theme,
+    preview_color,
+    recolor_python,
+    recolor_web,
+)
 from .migrate import maybe_migrate_config
 
-THEMES_DIR = Path(__file__).parent / "themes"
-
-
-conf = ConfigManager()
-
 QDir.addSearchPath("ReColor", str(Path(__file__).parent / "AnKing"))
 
 
@@ -23,6 +23,20 @@ def open_web(url: str) -> None:
     openLink(f"https://{url}")
 
 
+# file name -> icon, loaded once per session
+_header_icons: Dict[str, QIcon] = {}
+
+
+def header_icon(filename: str) -> QIcon:
+    if (icon := _header_icons.get(filename)) is None:
+        icon = QIcon()
+        icon.addPixmap(
+            QPixmap(f"ReColor:{filename}"), QIcon.Mode.Normal, QIcon.State.Off
+        )
+        _header_icons[filename] = icon
+    return icon
+
+
 def header_layout(conf_window: ConfigWindow) -> QHBoxLayout:
     icons_layout = QHBoxLayout()
     icons_layout.addStretch()
@@ -34,12 +48,8 @@ def header_layout(conf_window: ConfigWindow) -> QHBoxLayout:
         ("Facebook.png", (31, 31), "facebook.com/ankingmed"),
     ]
     for image in images:
-        icon = QIcon()
-        icon.addPixmap(
-            QPixmap(f"ReColor:{image[0]}"), QIcon.Mode.Normal, QIcon.State.Off
-        )
         button = QToolButton(conf_window)
-        button.setIcon(icon)
+        button.setIcon(header_icon(image[0]))
         button.setIconSize(QSize(*image[1]))
         button.setMaximumSize(QSize(*image[1]))
         button.setMinimumSize(QSize(*image[1]))
@@ -53,36 +63,100 @@ def header_layout(conf_window: ConfigWindow) -> QHBoxLayout:
 
 def on_save() -> None:
     conf.save()
+    invalidate_compiled_theme()
     recolor_python()
     recolor_web()
 
 
+def on_color_preview(key: str, color: str) -> None:
+    # key is "colors.{name}.{color_idx}"
+    _, name, idx = key.split(".")
+    preview_color(name, int(idx), color)
+
+
 def with_window(conf_window: ConfigWindow) -> None:
     conf_window.setWindowTitle("ReColor Settings")
-    conf_window.setMinimumWidth(500)
+    conf_window.setMinimumWidth(700)
     conf_window.execute_on_save(on_save)
     conf_window.main_layout.insertLayout(0, header_layout(conf_window))
     conf_window.main_layout.insertSpacing(1, 10)
     conf_window.after_advanced_save_hook.append(lambda: maybe_migrate_config(conf))
-
-
-def color_idx() -> int:
-    return 2 if theme_manager.night_mode else 1
-
-
-def populate_tab(layout: ConfigLayout, conf_keys: List[str]) -> None:
-    for conf_key in conf_keys:
-        name = conf.get(f"colors.{conf_key}.0")
-        anki_color = getattr(colors, conf_key, None)
-        description = anki_color["comment"] if anki_color is not None else None
-        layout.color_input(
-            f"colors.{conf_key}.{color_idx()}", name, tooltip=description, opacity=True
+    conf_window.after_advanced_save_hook.append(invalidate_compiled_theme)
+    conf_window.color_preview_hook.append(on_color_preview)
+    conf_window.execute_on_close(end_preview)
+    advanced_menu(conf_window)
+
+
+def advanced_menu(conf_window: ConfigWindow) -> None:
+    "Turns the Advanced button into a menu of the config editor and the diagnostics panel"
+    menu = QMenu(conf_window.advanced_btn)
+    menu.addAction("Edit Config").triggered.connect(conf_window.on_advanced)
+    menu.addAction("Diagnostics").triggered.connect(
+        lambda _: diagnostics_window(conf_window)
+    )
+    conf_window.advanced_btn.clicked.disconnect()
+    conf_window.advanced_btn.setMenu(menu)
+
+
+def diagnostics_window(parent: QWidget) -> None:
+    dialog = QDialog(parent)
+    # A new dialog is made each time it is opened
+    dialog.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+    dialog.setWindowTitle("ReColor Diagnostics")
+    dialog.resize(700, 450)
+    layout = QVBoxLayout(dialog)
+
+    checkbox = QCheckBox("Record timings of the recolor stages")
+    checkbox.setChecked(diagnostics.enabled)
+    layout.addWidget(checkbox)
+
+    text = QPlainTextEdit()
+    text.setReadOnly(True)
+    text.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+    layout.addWidget(text)
+
+    def refresh() -> None:
+        lines = [diagnostics.summary(), "", "Recent:"]
+        for event in reversed(diagnostics.recent()):
+            detail = ", ".join(f"{k}={v}" for k, v in event.detail.items())
+            lines.append(f"{event.stage:<28}{event.seconds * 1000:>10.3f} ms  {detail}")
+        text.setPlainText("\n".join(lines))
+
+    def on_toggle(checked: bool) -> None:
+        diagnostics.set_enabled(checked)
+        refresh()
+
+    def clear() -> None:
+        diagnostics.clear()
+        refresh()
+
+    def export() -> None:
+        path, _ = QFileDialog.getSaveFileName(
+            dialog, "Export Diagnostics", "recolor_diagnostics.json", "JSON (*.json)"
         )
-    layout.stretch()
-
-
-def main_tab(conf_window: ConfigWindow) -> None:
-    conf_keys = [
+        if path:
+            Path(path).write_text(diagnostics.export(), encoding="utf8")
+            tooltip("Exported diagnostics", parent=dialog)
+
+    checkbox.toggled.connect(on_toggle)
+    btn_box = QHBoxLayout()
+    for label, fn in (("Refresh", refresh), ("Clear", clear), ("Export JSON", export)):
+        button = QPushButton(label)
+        button.clicked.connect(fn)
+        btn_box.addWidget(button)
+    btn_box.addStretch(1)
+    close_button = QPushButton("Close")
+    close_button.clicked.connect(dialog.close)
+    btn_box.addWidget(close_button)
+    layout.addLayout(btn_box)
+
+    refresh()
+    dialog.show()
+
+
+# Choices of the category filter in the colors tab
+COLOR_CATEGORIES = {
+    "Main": [
         "FG",
         "FG_SUBTLE",
         "FG_DISABLED",
@@ -97,24 +171,14 @@ def main_tab(conf_window: ConfigWindow) -> None:
         "BORDER_SUBTLE",
         "BORDER_STRONG",
         "BORDER_FOCUS",
-    ]
-    tab = conf_window.add_tab("Main")
-    populate_tab(tab, conf_keys)
-
-
-def buttons_tab(conf_window: ConfigWindow) -> None:
-    conf_keys = [
+    ],
+    "Buttons": [
         "BUTTON_BG",
         "BUTTON_HOVER",
         "BUTTON_HOVER_BORDER",
         "BUTTON_DISABLED",
-    ]
-    tab = conf_window.add_tab("Buttons")
-    populate_tab(tab, conf_keys)
-
-
-def cards_tab(conf_window: ConfigWindow) -> None:
-    conf_keys = [
+    ],
+    "Cards": [
         "STATE_NEW",
         "STATE_LEARN",
         "STATE_REVIEW",
@@ -129,13 +193,8 @@ def cards_tab(conf_window: ConfigWindow) -> None:
         "FLAG_7",
         "ACCENT_CARD",
         "ACCENT_NOTE",
-    ]
-    tab = conf_window.add_tab("Cards")
-    populate_tab(tab, conf_keys)
-
-
-def misc_tab(conf_window: ConfigWindow) -> None:
-    conf_keys = [
+    ],
+    "Misc": [
         "HIGHLIGHT_BG",
         "HIGHLIGHT_FG",
         "SELECTED_BG",
@@ -148,45 +207,56 @@ def misc_tab(conf_window: ConfigWindow) -> None:
         "SCROLLBAR_BG",
         "SCROLLBAR_BG_ACTIVE",
         "SCROLLBAR_BG_HOVER",
-    ]
-    tab = conf_window.add_tab("Misc")
-    populate_tab(tab, conf_keys)
+    ],
+}
+
+
+def colors_tab(conf_window: ConfigWindow) -> None:
+    conf_window.add_lazy_tab(
+        "Colors", lambda tab: color_table(conf_window, tab, COLOR_CATEGORIES)
+    )
 
 
 def themes_list() -> List[str]:
-    themes = []
-    for child in sorted(THEMES_DIR.iterdir()):
-        if child.is_file() and child.suffix == ".json":
-            themes.append(child.stem)
-    return themes
+    return themes.catalog.names()
 
 
-def replace_conf_color(conf: ConfigManager, theme_json: Any, dark_mode: bool) -> None:
+def replace_conf_color(conf: ConfigManager, theme_json: Any, dark_mode: bool) -> List[str]:
+    "Returns the keys of the colors that changed"
     modeidx = 2 if dark_mode else 1
-
+    changed = []
     for color in theme_json["colors"]:
-        conf[f"colors.{color}.{modeidx}"] = theme_json["colors"][color][modeidx]
+        key = f"colors.{color}.{modeidx}"
+        value = theme_json["colors"][color][modeidx]
+        if conf.get(key) != value:
+            conf[key] = value
+            changed.append(key)
+    return changed
 
 
 def apply_theme(conf_window: ConfigWindow, theme: str) -> None:
-    theme_path = THEMES_DIR / f"{theme}.json"
-    theme_json = json.loads(theme_path.read_text())
+    theme_info = themes.catalog.info(theme)
+    theme_json = themes.catalog.load(theme)
 
-    # Dark mode or universal
-    if not theme.startswith("(dark)"):
-        replace_conf_color(conf, theme_json, False)
+    changed = []
     # Light mode or universal
-    if not theme.startswith("(light)"):
-        replace_conf_color(conf, theme_json, True)
+    if theme_info.light:
+        changed += replace_conf_color(conf, theme_json, False)
+    # Dark mode or universal
+    if theme_info.dark:
+        changed += replace_conf_color(conf, theme_json, True)
 
-    conf_window.update_widgets()
+    conf_window.update_widgets(changed)
     conf_window.main_tab.setCurrentIndex(0)
 
     tooltip(f"Applied theme: {theme}<br />Press save to save changes")
 
 
 def themes_tab(conf_window: ConfigWindow) -> None:
-    tab = conf_window.add_tab("Themes")
+    conf_window.add_lazy_tab("Themes", lambda tab: build_themes_tab(conf_window, tab))
+
+
+def build_themes_tab(conf_window: ConfigWindow, tab: ConfigLayout) -> None:
     tab.space(10)
 
     tab.text(
@@ -216,10 +286,6 @@ def themes_tab(conf_window: ConfigWindow) -> None:
     tab.stretch()
 
 
-conf.use_custom_window()
 conf.on_window_open(with_window)
-conf.add_config_tab(main_tab)
-conf.add_config_tab(buttons_tab)
-conf.add_config_tab(cards_tab)
-conf.add_config_tab(misc_tab)
+conf.add_config_tab(colors_tab)
 conf.add_config_tab(themes_tab)
@@ -0,0 +1,166 @@
+"""Timings of the recolor pipeline stages, to look into reports of ReColor slowing Anki down.
+
+Off by default. Turn it on in Advanced > Diagnostics of the config window,
+or with the RECOLOR_DIAGNOSTICS environment variable to include startup.
+When off, stage() returns a shared no-op, so instrumented code only pays for a function call.
+"""
+
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Type
+from collections import deque
+from types import TracebackType
+import json
+import os
+import time
+
+from . import startup
+
+RING_SIZE = 1000
+
+enabled = bool(os.environ.get("RECOLOR_DIAGNOSTICS"))
+
+
+class Event(NamedTuple):
+    stage: str
+    # time.time() when the stage started
+    start: float
+    seconds: float
+    detail: Dict[str, Any]
+
+
+class StageTotal:
+    "Totals of a stage since diagnostics were enabled, including events dropped from the ring buffer"
+
+    __slots__ = ("count", "seconds", "max_seconds")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total_s": self.seconds,
+            "mean_s": self.seconds / self.count if self.count else 0.0,
+            "max_s": self.max_seconds,
+        }
+
+
+events: Deque[Event] = deque(maxlen=RING_SIZE)
+totals: Dict[str, StageTotal] = {}
+
+
+class _Stage:
+    __slots__ = ("name", "detail", "_start", "_wall_start")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.detail: Dict[str, Any] = {}
+
+    def __enter__(self) -> "_Stage":
+        self._wall_start = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        record(self.name, time.perf_counter() - self._start, self._wall_start, self.detail)
+
+    def note(self, **detail: Any) -> None:
+        "Adds details like item counts to the event"
+        self.detail.update(detail)
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullStage":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        pass
+
+    def note(self, **detail: Any) -> None:
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name: str) -> Any:
+    """Times a `with` block:
+    with diagnostics.stage("compile") as s:
+        ...
+        s.note(colors=len(colors))
+    """
+    if not enabled:
+        return _NULL_STAGE
+    return _Stage(name)
+
+
+def record(
+    name: str, seconds: float, start: Optional[float] = None, detail: Optional[Dict[str, Any]] = None
+) -> None:
+    if not enabled:
+        return
+    if start is None:
+        start = time.time() - seconds
+    events.append(Event(name, start, seconds, detail or {}))
+    total = totals.get(name)
+    if total is None:
+        total = totals[name] = StageTotal()
+    total.count += 1
+    total.seconds += seconds
+    total.max_seconds = max(total.max_seconds, seconds)
+
+
+def set_enabled(value: bool) -> None:
+    global enabled
+    enabled = value
+
+
+def clear() -> None:
+    events.clear()
+    totals.clear()
+
+
+def summary() -> str:
+    "One line per stage, slowest total first"
+    if not totals:
+        return "Nothing recorded yet."
+    lines = [f"{'Stage':<28}{'Count':>8}{'Total ms':>12}{'Mean ms':>12}{'Max ms':>12}"]
+    for name, total in sorted(totals.items(), key=lambda item: -item[1].seconds):
+        lines.append(
+            f"{name:<28}{total.count:>8}{total.seconds * 1000:>12.2f}"
+            f"{total.seconds / total.count * 1000:>12.3f}{total.max_seconds * 1000:>12.3f}"
+        )
+    return "\n".join(lines)
+
+
+def export() -> str:
+    data: Dict[str, Any] = {
+        "enabled": enabled,
+        "totals": {name: total.to_dict() for name, total in totals.items()},
+        "events": [event._asdict() for event in events],
+        "startup": None,
+    }
+    if startup.report is not None:
+        data["startup"] = {
+            "stages": [stage._asdict() for stage in startup.report.stages],
+            "anki_cpu_seconds": startup.report.anki_cpu_seconds,
+            "share": startup.report.share,
+        }
+    return json.dumps(data, indent=2)
+
+
+def recent(count: int = 50) -> List[Event]:
+    return list(events)[-count:]
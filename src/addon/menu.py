@@ -1,8 +1,11 @@
-from aqt import mw
+from aqt import gui_hooks, mw
 from aqt.utils import openLink
 from aqt.qt import QMenu, QAction
 
-from .config import conf
+from . import conf
+
+# Delay after the profile opened before building the config window
+PREBUILD_DELAY_MS = 3000
 
 
 def create_get_help_submenu(parent: QMenu) -> QMenu:
@@ -72,11 +75,32 @@ def get_anking_menu() -> QMenu:
 ########################################
 
 
+def open_config() -> bool:
+    "Imports the config window code on first use"
+    from . import config
+
+    return conf.open_config()
+
+
+def prebuild_config_window() -> None:
+    "Builds the hidden config window while Anki is idle, so opening it is instant"
+    from . import config
+
+    conf.build_config_window().prepare()
+
+
+def on_profile_did_open() -> None:
+    if conf.get("prebuild_config_window", True):
+        mw.progress.single_shot(PREBUILD_DELAY_MS, prebuild_config_window, False)
+
+
 def setupMenu() -> None:
     menu = get_anking_menu()
     a = QAction("ReColor", menu)
-    a.triggered.connect(conf.open_config)
+    a.triggered.connect(open_config)
     menu.addAction(a)
+    mw.addonManager.setConfigAction(conf.addon_dir, open_config)
 
 
 setupMenu()
+gui_hooks.profile_did_open.append(on_profile_did_open)
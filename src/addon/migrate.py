@@ -1,58 +1,130 @@
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
 from pathlib import Path
+import copy
 import json
 import os
 
 from aqt.utils import showInfo
 
-from .ankiaddonconfig import ConfigManager, Version
+from . import rgba
+from .ankiaddonconfig import ConfigManager
+from .version import VERSION
+
+ConfigVersion = Tuple[int, int]
+# Modifies the config in place. Gets a copy of the default config as well.
+MigrationStep = Callable[[Dict[str, Any], Dict[str, Any]], None]
+
+
+class Migration(NamedTuple):
+    # Configs older than this version are migrated by step
+    version: ConfigVersion
+    step: MigrationStep
+    # Shown to the user after the migrated config is saved
+    notice: Optional[str]
+    # File name in user_files to back up the config to before the step
+    backup: Optional[str]
+
+
+# Sorted by version
+MIGRATIONS: List[Migration] = []
+
+
+def migration(
+    version: ConfigVersion, notice: Optional[str] = None, backup: Optional[str] = None
+) -> Callable[[MigrationStep], MigrationStep]:
+    "Registers a migration step"
+
+    def register(step: MigrationStep) -> MigrationStep:
+        MIGRATIONS.append(Migration(version, step, notice, backup))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return step
+
+    return register
+
+
+def parse_version(version_string: str) -> ConfigVersion:
+    major, minor = version_string.split(".")
+    return (int(major), int(minor))
+
+
+def current_version() -> ConfigVersion:
+    return parse_version(os.environ.get("ANKIRECOLOR_VERSION") or VERSION)
+
+
+def config_version(conf: ConfigManager) -> ConfigVersion:
+    return (conf["version.major"], conf["version.minor"])
 
 
 def maybe_migrate_config(conf: ConfigManager) -> None:
-    version = Version(conf["version.major"], conf["version.minor"])
-    version_string = get_new_version_string()
-    if version == "-1.-1":
-        if detect_v2(conf):
-            v2_to_v3(conf)
-    elif version < "2.0":
-        maybe_v1_to_v2(conf)
-        v2_to_v3(conf)
-    elif version < "3.0":
-        v2_to_v3(conf)
-
-    if version != version_string:
-        conf["version.major"] = int(version_string.split(".")[0])
-        conf["version.minor"] = int(version_string.split(".")[1])
-        conf.save()
-
-# some versions of v2 may be incorrectly in -1.-1
-def detect_v2(conf: ConfigManager) -> bool:
-    return "CANVAS_GLASS" not in conf["colors"] and "CANVAS" in conf["colors"]
-
-
-def get_new_version_string() -> str:
-    version_string = os.environ.get("ANKIRECOLOR_VERSION")
-    if not version_string:
-        version_file = Path(__file__).parent / "VERSION"
-        version_string = version_file.read_text()
-    return version_string
+    """Applies the pending migration steps to a copy of the config, then saves it once.
+    Doesn't read or write any file if the config is already at the current version,
+    or is the default config of a fresh install."""
+    version = config_version(conf)
+    current = current_version()
+    if version == current:
+        return
+
+    config = conf.copy()
+    migrations = pending_migrations(version, config)
+    if version == (-1, -1) and not migrations:
+        return
+    notices = []
+    for m in migrations:
+        if m.backup:
+            write_backup(m.backup, config)
+        m.step(config, conf.get_default_copy(""))
+        if m.notice:
+            notices.append(m.notice)
+    config["version"] = {"major": current[0], "minor": current[1]}
+
+    for key, value in config.items():
+        conf.set(key, value)
+    conf.save()
 
+    if notices:
+        showInfo("\n\n".join(notices), title="Anki Recolor Update")
 
-# To Anki 2.1.55+ theme style
-def maybe_v1_to_v2(conf: ConfigManager) -> None:
-    conf.load()
 
-    # Load and save v1 colors
+def pending_migrations(version: ConfigVersion, config: Dict[str, Any]) -> List[Migration]:
+    if version == (-1, -1):
+        # Fresh installs have the default config's version of -1.-1,
+        # but some versions of v2 were saved with it as well
+        if not detect_v2(config):
+            return []
+        version = (2, 0)
+    return [m for m in MIGRATIONS if version < m.version]
+
+
+def detect_v2(config: Dict[str, Any]) -> bool:
+    return "CANVAS_GLASS" not in config["colors"] and "CANVAS" in config["colors"]
+
+
+def write_backup(filename: str, config: Dict[str, Any]) -> None:
     user_files_dir = Path(__file__).parent / "user_files"
     user_files_dir.mkdir(parents=False, exist_ok=True)
-    v1_colors_path = user_files_dir / "v1_config.json"
-    v1_colors_path.write_text(json.dumps(conf.get(""), indent=2))
-    v1_colors = conf.get("colors")
+    (user_files_dir / filename).write_text(json.dumps(config, indent=2))
+
+
+# To Anki 2.1.55+ theme style
+@migration(
+    (2, 0),
+    backup="v1_config.json",
+    notice="\n".join(
+        [
+            "Anki v2.1.55+ has reworked the themes code, so the previous ReColor config no longer works with the new themes.",
+            "Your previous ReColor theme has been moved over to the new config as best as possible, but things may look different.",
+            "Your previous ReColor config have been saved to the addon user_files directory, 'v1_config.json'.",
+        ]
+    ),
+)
+def v1_to_v2(config: Dict[str, Any], defaults: Dict[str, Any]) -> None:
+    v1_colors = config["colors"]
     v1_anki_colors_path = Path(__file__).parent / "v1_anki_config.json"
     v1_anki_colors = json.loads(v1_anki_colors_path.read_text())["colors"]
 
     # Load v2 vinally anki colors
-    v2_colors = conf.get_default("colors")
-    new_colors = conf.get_default("colors")
+    v2_colors = defaults["colors"]
+    new_colors = copy.deepcopy(defaults["colors"])
 
     COLOR_MAP = {
         "TEXT_FG": "FG",
@@ -125,20 +197,7 @@ def maybe_v1_to_v2(conf: ConfigManager) -> None:
     if new_colors["BUTTON_HOVER"][2] == new_colors["BUTTON_BG"][2]:
         new_colors["BUTTON_HOVER"][2] = darken(new_colors["BUTTON_HOVER"][2], 5)
 
-    conf.set("colors", new_colors)
-    conf.save()
-
-    # Inform users that previous ReColor config is no longer valid
-    showInfo(
-        "\n".join(
-            [
-                "Anki v2.1.55+ has reworked the themes code, so the previous ReColor config no longer works with the new themes.",
-                "Your previous ReColor theme has been moved over to the new config as best as possible, but things may look different.",
-                "Your previous ReColor config have been saved to the addon user_files directory, 'v1_config.json'.",
-            ]
-        ),
-        title="Anki Recolor Update",
-    )
+    config["colors"] = new_colors
 
 
 # if by is negative, lightens color
@@ -152,65 +211,18 @@ def darken(hex: str, by: int) -> str:
     r = max(0, min(16 ** 2 - 1, r))
     g = max(0, min(16 ** 2 - 1, g))
     b = max(0, min(16 ** 2 - 1, b))
-    new_r = "%0.2X" % r
     return "%s%0.2X%0.2X%0.2X%s" % (hex[0], r, g, b, hex[7:])
 
 
 def adjust_alpha(color: str, by: float) -> str:
-    alpha = 255
-    if color.startswith("#"):
-        if len(color) == 9:
-            alpha = int(color[8:10], 16)
-            body = color[0:8]
-        elif len(color) == 7:
-            body = color
-        elif len(color) == 4:
-            body = f"#{color[0]*2}{color[1]*2}{color[2]*2}"
-    elif color.startswith("rgba"):
-        [r, g, b, a] = map(int, color.split(")")[0].split(","))
-        alpha = a
-        body = f"#{r:02X}{g:02X}{b:02X}"
-    elif color == "white":
-        body = "#ffffff"
-    elif color == "black":
-        body = "#000000"
-    else:
-        # probably some other keyword-named color that is difficult to adjust alpha
-        return color
-
-    alpha = int(alpha * by)
-    return f"{body}{alpha:02X}"
-
-
-def v2_to_v3(conf: ConfigManager) -> None:
-    conf.load()
-    colors = conf.get("colors")
-
-    # add canvas-glass
-    elevated = colors["CANVAS_ELEVATED"]
-    colors["CANVAS_GLASS"] = [
-        "Background (transparent text surface)",
-        adjust_alpha(elevated[1], 0.4),
-        adjust_alpha(elevated[2], 0.4),
-        "--canvas-glass",
-    ]
-
-    canvas = colors["CANVAS"]
-    if not isinstance(canvas[3], list):
-        canvas[3] = [canvas[3]]
-    canvas[3].append("--bs-body-bg")
-
-    fg = colors["FG"]
-    if not isinstance(fg[3], list):
-        fg[3] = [fg[3]]
-    fg[3].append("--bs-body-color")
-
-    conf.set("colors", colors)
-    conf.save()
+    "Keyword-named colors other than white, black and transparent are returned unchanged"
+    return rgba.scale_alpha(color, by)
 
 
 # for Anki v2.66+
-def adjust_colors_v3(colors: dict) -> None:
+@migration((3, 0))
+def adjust_colors_v3(config: Dict[str, Any], defaults: Dict[str, Any]) -> None:
+    colors = config["colors"]
     # add canvas-glass
     elevated = colors["CANVAS_ELEVATED"]
     colors["CANVAS_GLASS"] = [
@@ -220,12 +232,12 @@ def adjust_colors_v3(colors: dict) -> None:
         "--canvas-glass",
     ]
 
-    canvas = colors["CANVAS"]
-    if not isinstance(canvas[3], list):
-        canvas[3] = [canvas[3]]
-    canvas[3].append("--bs-body-bg")
+    add_css_name(colors["CANVAS"], "--bs-body-bg")
+    add_css_name(colors["FG"], "--bs-body-color")
+
 
-    fg = colors["FG"]
-    if not isinstance(fg[3], list):
-        fg[3] = [fg[3]]
-    fg[3].append("--bs-body-color")
+def add_css_name(color_entry: List[Any], css_name: str) -> None:
+    if not isinstance(color_entry[3], list):
+        color_entry[3] = [color_entry[3]]
+    if css_name not in color_entry[3]:
+        color_entry[3].append(css_name)
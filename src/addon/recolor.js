@@ -1,13 +1,55 @@
-/* global ReColor */
+// In-page ReColor runtime. Injected once per document,
+// afterwards colors are changed by calling ReColor.update() with a json payload:
+// { light: { '--css-var': value, ... }, dark: { ... }, extra: 'css' }
+// Variables with a null value are removed. Every key is optional.
+// The style nodes are created on first use and reused afterwards.
+// ReColor.lastUpdateMs holds how long the last update took.
+if (!window.ReColor) {
+  const SELECTORS = { light: 'body', dark: 'body.night_mode' }
 
-window.ReColor = {}
-ReColor.withConfig = function (confstr, colorIdx) {
-  const conf = JSON.parse(confstr)
-  const colors = conf.colors
-  for (const colorName in colors) {
-    const colorEntry = colors[colorName]
-    const cssColorName = colorEntry[3]
-    const colorHex = colorEntry[colorIdx]
-    document.documentElement.style.setProperty(cssColorName, colorHex)
+  const styleNode = function (id) {
+    let node = document.getElementById(id)
+    if (!node) {
+      node = document.createElement('style')
+      node.id = id
+      document.head.appendChild(node)
+    }
+    return node
+  }
+
+  const modeRule = function (mode) {
+    const node = styleNode('recolor-' + mode)
+    const rules = node.sheet.cssRules
+    if (!rules.length || rules[0].selectorText !== SELECTORS[mode]) {
+      node.textContent = SELECTORS[mode] + ' {}'
+    }
+    return node.sheet.cssRules[0]
+  }
+
+  window.ReColor = {
+    styleNode,
+    lastUpdateMs: 0,
+    update: function (payload) {
+      const start = performance.now()
+      for (const mode of ['light', 'dark']) {
+        const variables = payload[mode]
+        if (!variables) continue
+        const style = modeRule(mode).style
+        for (const name in variables) {
+          if (variables[name] === null) {
+            style.removeProperty(name)
+          } else {
+            style.setProperty(name, variables[name])
+          }
+        }
+      }
+      if (typeof payload.extra === 'string') {
+        const node = styleNode('recolor-extra')
+        if (node.textContent !== payload.extra) {
+          node.textContent = payload.extra
+        }
+      }
+      this.lastUpdateMs = performance.now() - start
+    }
   }
 }
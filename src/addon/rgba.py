@@ -0,0 +1,126 @@
+"""Color parsing and conversion.
+
+Colors are parsed into a packed 0xRRGGBBAA integer. Parsing and formatting are memoized,
+as the same few dozen config colors are converted over and over again.
+The speedup relies on those cache hits: converting a color for the first time costs more
+than the string slicing it replaced (see benchmarks/run.py, "distinct colors").
+
+The config stores colors in CSS syntax: #RGB, #RGBA, #RRGGBB, #RRGGBBAA, rgb(), rgba() or a color name.
+Note that Qt expects the alpha first (#AARRGGBB) in hex colors.
+"""
+
+from typing import Optional, Tuple
+import functools
+import re
+
+RGBA_FN_RE = re.compile(
+    r"rgba?\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*(?:,\s*(\d*\.?\d+)(%?)\s*)?\)\s*$"
+)
+HEX_RE = re.compile(r"#([0-9a-fA-F]{3,4}|[0-9a-fA-F]{6}|[0-9a-fA-F]{8})$")
+
+NAMED_COLORS = {
+    "white": 0xFFFFFFFF,
+    "black": 0x000000FF,
+    "transparent": 0x00000000,
+}
+
+
+def pack(r: int, g: int, b: int, a: int = 255) -> int:
+    return (r << 24) | (g << 16) | (b << 8) | a
+
+
+def unpack(packed: int) -> Tuple[int, int, int, int]:
+    "Returns (r, g, b, a)"
+    return (packed >> 24) & 0xFF, (packed >> 16) & 0xFF, (packed >> 8) & 0xFF, packed & 0xFF
+
+
+def _clamp(value: int) -> int:
+    return max(0, min(255, value))
+
+
+@functools.lru_cache(maxsize=1024)
+def parse(color: str) -> Optional[int]:
+    "Returns the packed RGBA color, or None if the syntax isn't supported"
+    return _parse(color)
+
+
+def _parse(color: str) -> Optional[int]:
+    color = color.strip()
+    if color.startswith("#"):
+        m = HEX_RE.match(color)
+        if not m:
+            return None
+        digits = m.group(1)
+        # #RRGGBB and #RRGGBBAA are the common cases
+        if len(digits) == 6:
+            return int(digits, 16) << 8 | 0xFF
+        if len(digits) <= 4:
+            digits = "".join(c * 2 for c in digits)
+            if len(digits) == 6:
+                digits += "ff"
+        return int(digits, 16)
+    if color.startswith("rgb"):
+        m = RGBA_FN_RE.match(color)
+        if not m:
+            return None
+        r, g, b, alpha, percent = m.groups()
+        a = 255
+        if alpha is not None:
+            a_fraction = float(alpha) / 100 if percent else float(alpha)
+            # Same as aqt.theme.ThemeManager.qcolor()
+            a = _clamp(int(255 * a_fraction))
+        return pack(_clamp(int(r)), _clamp(int(g)), _clamp(int(b)), a)
+    return NAMED_COLORS.get(color.lower())
+
+
+def to_hex(packed: int, alpha: bool = False) -> str:
+    "#rrggbb, or #rrggbbaa if the color is translucent or alpha is True"
+    if alpha or packed & 0xFF != 0xFF:
+        return f"#{packed:08x}"
+    return f"#{packed >> 8:06x}"
+
+
+def _has_alpha_digits(color: str) -> bool:
+    "#RGBA or #RRGGBBAA. These are converted even when opaque, as Qt would read them as ARGB."
+    color = color.strip()
+    return color.startswith("#") and len(color) in (5, 9)
+
+
+@functools.lru_cache(maxsize=1024)
+def to_css_rgba(color: str) -> str:
+    """#RGBA and #RRGGBBAA colors as rgba(), which Qt stylesheets understand.
+    Other colors are returned unchanged."""
+    if not _has_alpha_digits(color):
+        return color
+    packed = _parse(color)
+    if packed is None:
+        return color
+    r, g, b, a = unpack(packed)
+    return f"rgba({r}, {g}, {b}, {round(a / 255, 2)})"
+
+
+@functools.lru_cache(maxsize=1024)
+def to_qt_argb(color: str) -> str:
+    """Color string that QColor understands: #AARRGGBB for #RGBA, #RRGGBBAA, rgb() and rgba() colors.
+    #RGB, #RRGGBB and names are returned unchanged."""
+    stripped = color.strip()
+    if stripped.startswith("#"):
+        if len(stripped) not in (5, 9):
+            return color
+    elif not stripped.startswith("rgb"):
+        return color
+    # Already memoized as a whole, so skip parse()'s cache
+    packed = _parse(stripped)
+    if packed is None:
+        return color
+    # Move the alpha byte to the front
+    return f"#{(packed & 0xFF) << 24 | packed >> 8:08x}"
+
+
+def scale_alpha(color: str, by: float) -> str:
+    "Multiplies the alpha by `by`. Always returns #rrggbbaa"
+    packed = parse(color)
+    if packed is None:
+        return color
+    r, g, b, a = unpack(packed)
+    return to_hex(pack(r, g, b, _clamp(int(a * by))), alpha=True)
@@ -0,0 +1,84 @@
+"""Timing of the add-on's startup, and its share of Anki's startup.
+
+Anki's share is measured in cpu time of the process up to profile_did_open,
+as there is no portable way to get the wall clock time the process started at.
+Set the RECOLOR_STARTUP_REPORT environment variable to print the report to the console.
+"""
+
+from typing import Iterator, List, NamedTuple, Optional
+from contextlib import contextmanager
+import os
+import time
+
+from aqt import gui_hooks
+
+
+class StartupStage(NamedTuple):
+    name: str
+    seconds: float
+    cpu_seconds: float
+
+
+class StartupReport(NamedTuple):
+    stages: List[StartupStage]
+    # Cpu time of the whole process when the profile was opened
+    anki_cpu_seconds: float
+
+    @property
+    def addon_seconds(self) -> float:
+        return sum(stage.seconds for stage in self.stages)
+
+    @property
+    def addon_cpu_seconds(self) -> float:
+        return sum(stage.cpu_seconds for stage in self.stages)
+
+    @property
+    def share(self) -> float:
+        "ReColor's share of Anki's startup cpu time"
+        if not self.anki_cpu_seconds:
+            return 0.0
+        return self.addon_cpu_seconds / self.anki_cpu_seconds
+
+    def format(self) -> str:
+        lines = [
+            f"{stage.name}: {stage.seconds * 1000:.1f}ms ({stage.cpu_seconds * 1000:.1f}ms cpu)"
+            for stage in self.stages
+        ]
+        lines.append(
+            f"ReColor: {self.addon_seconds * 1000:.1f}ms, "
+            f"{self.share:.1%} of Anki's {self.anki_cpu_seconds * 1000:.0f}ms cpu time until the profile opened"
+        )
+        return "\n".join(lines)
+
+
+stages: List[StartupStage] = []
+report: Optional[StartupReport] = None
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield
+    finally:
+        stages.append(
+            StartupStage(
+                name=name,
+                seconds=time.perf_counter() - start,
+                cpu_seconds=time.process_time() - cpu_start,
+            )
+        )
+
+
+def on_profile_did_open() -> None:
+    global report
+    gui_hooks.profile_did_open.remove(on_profile_did_open)
+    report = StartupReport(stages=list(stages), anki_cpu_seconds=time.process_time())
+    if os.environ.get("RECOLOR_STARTUP_REPORT"):
+        print(report.format())
+
+
+def finish() -> None:
+    "Call once the add-on has loaded. The report is made when the profile opens."
+    gui_hooks.profile_did_open.append(on_profile_did_open)
@@ -0,0 +1,238 @@
+"""Theme pack: many themes in a single file.
+
+Layout (little-endian):
+    magic "RCTP", format version (u16), reserved (u16), header length (u32)
+    header: utf-8 json
+        {"schema": [[key, display name, css names], ...],
+         "themes": [[name, offset, length], ...]}
+    theme records, at the offsets given in the header:
+        presence bitmap, one bit per schema key
+        light and dark color (u32 packed RGBA each) per present key
+        extra length (u32), extra: utf-8 json, may be empty
+            {"colors": {key: entry}, "meta": {...}}
+            holds entries that don't fit the schema or whose colors can't be packed,
+            and the other top-level fields of the theme json.
+
+Only the header is parsed when a pack is opened.
+Theme records are read from a memory map when the theme is loaded.
+Close packs when done (or use them in a with statement), an open memory map locks the file on Windows.
+Colors are normalized to lowercase hex on the way, e.g. "white" becomes "#ffffff".
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from collections import Counter
+from pathlib import Path
+import copy
+import json
+import mmap
+import struct
+
+from . import rgba
+
+PACK_SUFFIX = ".rctp"
+MAGIC = b"RCTP"
+FORMAT_VERSION = 1
+PREAMBLE = struct.Struct("<4sHHI")
+COLOR_PAIR = struct.Struct("<II")
+EXTRA_LEN = struct.Struct("<I")
+
+SchemaEntry = Tuple[str, str, Any]  # key, display name, css names
+
+
+class ThemePackError(Exception):
+    pass
+
+
+class ThemePack:
+    def __init__(self, path: Path) -> None:
+        "Raises OSError if the file can't be read, ThemePackError if it isn't a valid theme pack"
+        self.path = path
+        with open(path, "rb") as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:
+                # Empty file
+                raise ThemePackError(f"Invalid theme pack {path}: {e!r}")
+        try:
+            magic, version, _, header_len = PREAMBLE.unpack_from(self._mmap, 0)
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ThemePackError(f"{path} is not a theme pack of version {FORMAT_VERSION}")
+            header = json.loads(
+                self._mmap[PREAMBLE.size : PREAMBLE.size + header_len].decode("utf-8")
+            )
+            self.schema: List[SchemaEntry] = [
+                (str(key), str(display_name), css_names)
+                for key, display_name, css_names in header["schema"]
+            ]
+            # name -> (offset, length)
+            self.index: Dict[str, Tuple[int, int]] = {
+                str(name): (int(offset), int(length))
+                for name, offset, length in header["themes"]
+            }
+            for offset, length in self.index.values():
+                if offset < 0 or length < 0 or offset + length > len(self._mmap):
+                    raise ThemePackError(f"Truncated theme pack {path}")
+        except ThemePackError:
+            self._mmap.close()
+            raise
+        except (struct.error, ValueError, KeyError, TypeError) as e:
+            self._mmap.close()
+            raise ThemePackError(f"Invalid theme pack {path}: {e!r}")
+
+    def close(self) -> None:
+        self._mmap.close()
+
+    def __enter__(self) -> "ThemePack":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def names(self) -> List[str]:
+        return list(self.index)
+
+    def record(self, name: str) -> bytes:
+        "Raw record bytes of a theme. Raises KeyError if it doesn't exist"
+        offset, length = self.index[name]
+        return self._mmap[offset : offset + length]
+
+    def color_count(self, name: str) -> int:
+        record = self.record(name)
+        bitmap = record[: _bitmap_len(len(self.schema))]
+        extra = _read_extra(record, bitmap)
+        return sum(bin(byte).count("1") for byte in bitmap) + len(extra.get("colors", {}))
+
+    def load(self, name: str) -> Dict[str, Any]:
+        "Returns the theme json. Raises KeyError if it doesn't exist"
+        record = self.record(name)
+        bitmap = record[: _bitmap_len(len(self.schema))]
+        colors: Dict[str, Any] = {}
+        pos = len(bitmap)
+        for i, (key, display_name, css_names) in enumerate(self.schema):
+            if bitmap[i // 8] & (1 << (i % 8)):
+                light, dark = COLOR_PAIR.unpack_from(record, pos)
+                pos += COLOR_PAIR.size
+                colors[key] = [
+                    display_name,
+                    rgba.to_hex(light),
+                    rgba.to_hex(dark),
+                    copy.deepcopy(css_names),
+                ]
+        extra = _read_extra(record, bitmap)
+        colors.update(extra.get("colors", {}))
+        theme: Dict[str, Any] = {"colors": dict(sorted(colors.items()))}
+        theme.update(extra.get("meta", {}))
+        return theme
+
+
+def _bitmap_len(key_count: int) -> int:
+    return (key_count + 7) // 8
+
+
+def _read_extra(record: bytes, bitmap: bytes) -> Dict[str, Any]:
+    present = sum(bin(byte).count("1") for byte in bitmap)
+    pos = len(bitmap) + present * COLOR_PAIR.size
+    (length,) = EXTRA_LEN.unpack_from(record, pos)
+    if not length:
+        return {}
+    pos += EXTRA_LEN.size
+    return json.loads(record[pos : pos + length].decode("utf-8"))
+
+
+def build_schema(themes: Iterable[Dict[str, Any]]) -> List[SchemaEntry]:
+    "The most common display name and css names of each color key"
+    variants: Dict[str, Counter] = {}
+    for theme in themes:
+        for key, entry in theme["colors"].items():
+            variant = json.dumps([entry[0], entry[3]])
+            variants.setdefault(key, Counter())[variant] += 1
+    schema = []
+    for key in sorted(variants):
+        display_name, css_names = json.loads(variants[key].most_common(1)[0][0])
+        schema.append((key, display_name, css_names))
+    return schema
+
+
+def _pack_record(theme: Dict[str, Any], schema: List[SchemaEntry]) -> bytes:
+    bitmap = bytearray(_bitmap_len(len(schema)))
+    values = bytearray()
+    colors = theme["colors"]
+    extra_colors = dict(colors)
+    for i, (key, display_name, css_names) in enumerate(schema):
+        entry = colors.get(key)
+        if entry is None or len(entry) != 4:
+            continue
+        if entry[0] != display_name or entry[3] != css_names:
+            continue
+        if not isinstance(entry[1], str) or not isinstance(entry[2], str):
+            continue
+        light = rgba.parse(entry[1])
+        dark = rgba.parse(entry[2])
+        if light is None or dark is None:
+            continue
+        bitmap[i // 8] |= 1 << (i % 8)
+        values += COLOR_PAIR.pack(light, dark)
+        del extra_colors[key]
+    extra: Dict[str, Any] = {}
+    if extra_colors:
+        extra["colors"] = extra_colors
+    meta = {k: v for k, v in theme.items() if k != "colors"}
+    if meta:
+        extra["meta"] = meta
+    extra_bytes = json.dumps(extra, separators=(",", ":")).encode("utf-8") if extra else b""
+    return bytes(bitmap) + bytes(values) + EXTRA_LEN.pack(len(extra_bytes)) + extra_bytes
+
+
+def write_pack(
+    path: Path,
+    themes: Dict[str, Dict[str, Any]],
+    schema: Optional[List[SchemaEntry]] = None,
+) -> None:
+    "themes: name -> theme json"
+    if schema is None:
+        schema = build_schema(themes.values())
+    records = [(name, _pack_record(theme, schema)) for name, theme in sorted(themes.items())]
+
+    # Offsets depend on the header length, which depends on the offsets' digits.
+    # Reserve a fixed width for each offset so one pass is enough.
+    def header_bytes(offsets: List[int]) -> bytes:
+        header = {
+            "schema": schema,
+            "themes": [
+                [name, offset, len(record)]
+                for (name, record), offset in zip(records, offsets)
+            ],
+        }
+        return json.dumps(header, separators=(",", ":")).encode("utf-8")
+
+    placeholder = header_bytes([10**12] * len(records))
+    offset = PREAMBLE.size + len(placeholder)
+    offsets = []
+    for _, record in records:
+        offsets.append(offset)
+        offset += len(record)
+    header = header_bytes(offsets).ljust(len(placeholder))
+    with open(path, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, 0, len(header)))
+        f.write(header)
+        for _, record in records:
+            f.write(record)
+
+
+def pack_json_themes(json_dir: Path, path: Path) -> List[str]:
+    "Packs every *.json theme in json_dir. Returns the packed theme names."
+    themes = {
+        theme_path.stem: json.loads(theme_path.read_text(encoding="utf-8"))
+        for theme_path in sorted(json_dir.glob("*.json"))
+    }
+    write_pack(path, themes)
+    return list(themes)
+
+
+def unpack_json_themes(path: Path, json_dir: Path) -> List[str]:
+    "Writes each theme in the pack to json_dir/{name}.json. Returns the theme names."
+    with ThemePack(path) as pack:
+        for name in pack.names():
+            theme_path = json_dir / f"{name}.json"
+            theme_path.write_text(json.dumps(pack.load(name), indent=4), encoding="utf-8")
+        return pack.names()
@@ -0,0 +1,204 @@
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import json
+import os
+
+from .themepack import PACK_SUFFIX, ThemePack, ThemePackError
+
+ADDON_DIR = Path(__file__).parent
+THEMES_DIR = ADDON_DIR / "themes"
+USER_FILES_DIR = ADDON_DIR / "user_files"
+
+
+class ThemeInfo(NamedTuple):
+    name: str
+    # Theme json file, or the theme pack that contains the theme
+    path: str
+    # Whether the theme has colors for light and dark mode.
+    # Themes named "(dark) ..." or "(light) ..." only have one of them.
+    light: bool
+    dark: bool
+    color_count: int
+    content_hash: str
+    # (mtime_ns, size) of the file when it was indexed
+    stat: List[int]
+
+
+def theme_modes(name: str) -> Dict[str, bool]:
+    return {
+        "light": not name.startswith("(dark)"),
+        "dark": not name.startswith("(light)"),
+    }
+
+
+class ThemeCatalog:
+    """Index of the bundled themes, and the themes in theme packs (*.rctp) in the same directory.
+
+    The index (name, modes, color count, content hash) is built on first use,
+    and persisted to `index_path` so unchanged theme files aren't read again in later sessions.
+    Theme bodies are only loaded when needed, and the last `cache_size` ones are kept in memory.
+    Theme packs are only open while they are read, so the add-on can be updated while Anki runs.
+    """
+
+    def __init__(
+        self, themes_dir: Path, index_path: Optional[Path] = None, cache_size: int = 8
+    ) -> None:
+        self.themes_dir = themes_dir
+        self.index_path = index_path
+        self.cache_size = cache_size
+        self._index: Optional[Dict[str, ThemeInfo]] = None
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def __iter__(self) -> Iterator[ThemeInfo]:
+        return iter(self.index().values())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.index()
+
+    def names(self) -> List[str]:
+        return list(self.index())
+
+    def info(self, name: str) -> ThemeInfo:
+        "Raises KeyError if the theme doesn't exist"
+        return self.index()[name]
+
+    def load(self, name: str) -> Dict[str, Any]:
+        """Returns the parsed theme json. Raises KeyError if the theme doesn't exist.
+        The returned dict is shared with the cache, don't modify it."""
+        if (theme := self._cache.get(name)) is not None:
+            self._cache.move_to_end(name)
+            return theme
+        info = self.info(name)
+        if info.path.endswith(PACK_SUFFIX):
+            with ThemePack(Path(info.path)) as pack:
+                theme = pack.load(name)
+        else:
+            theme = json.loads(Path(info.path).read_bytes())
+        self._remember(name, theme)
+        return theme
+
+    def _remember(self, name: str, theme: Dict[str, Any]) -> None:
+        self._cache[name] = theme
+        self._cache.move_to_end(name)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def refresh(self) -> None:
+        "Rescans the themes directory on next use"
+        self._index = None
+        self._cache.clear()
+
+    # Index
+
+    def index(self) -> Dict[str, ThemeInfo]:
+        "name -> ThemeInfo, sorted by name"
+        if self._index is None:
+            self._index = self._build_index()
+        return self._index
+
+    def _read_saved_index(self) -> Dict[str, ThemeInfo]:
+        if self.index_path is None:
+            return {}
+        try:
+            saved = json.loads(self.index_path.read_text(encoding="utf8"))
+            return {entry[0]: ThemeInfo(*entry) for entry in saved}
+        except Exception:
+            # Missing or corrupt index, rebuild it
+            return {}
+
+    def _write_saved_index(self, index: Dict[str, ThemeInfo]) -> None:
+        if self.index_path is None:
+            return
+        try:
+            self.index_path.parent.mkdir(parents=False, exist_ok=True)
+            self.index_path.write_text(
+                json.dumps([list(info) for info in index.values()]), encoding="utf8"
+            )
+        except OSError:
+            pass
+
+    def _build_index(self) -> Dict[str, ThemeInfo]:
+        saved = self._read_saved_index()
+        index: Dict[str, ThemeInfo] = {}
+        changed = False
+        with os.scandir(self.themes_dir) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                file_stat = [stat.st_mtime_ns, stat.st_size]
+                if entry.name.endswith(PACK_SUFFIX):
+                    pack_index = self._saved_pack_entries(saved, entry.path, file_stat)
+                    if pack_index is None:
+                        pack_index = self._index_pack(entry.path, file_stat)
+                        changed = True
+                    # Json theme files take precedence over packed themes of the same name
+                    for name, info in pack_index.items():
+                        index.setdefault(name, info)
+                    continue
+                if not entry.name.endswith(".json"):
+                    continue
+                name = entry.name[: -len(".json")]
+                info = saved.get(name)
+                if info is None or info.path != entry.path or info.stat != file_stat:
+                    info = self._index_file(name, entry.path, file_stat)
+                    changed = True
+                index[name] = info
+        if changed or len(index) != len(saved):
+            self._write_saved_index(index)
+        return dict(sorted(index.items()))
+
+    def _saved_pack_entries(
+        self, saved: Dict[str, ThemeInfo], path: str, file_stat: List[int]
+    ) -> Optional[Dict[str, ThemeInfo]]:
+        "None if the pack isn't in the saved index or changed since"
+        entries = {name: info for name, info in saved.items() if info.path == path}
+        if not entries or any(info.stat != file_stat for info in entries.values()):
+            return None
+        return entries
+
+    def _index_pack(self, path: str, file_stat: List[int]) -> Dict[str, ThemeInfo]:
+        try:
+            pack = ThemePack(Path(path))
+        except (OSError, ThemePackError):
+            return {}
+        index = {}
+        with pack:
+            for name in pack.names():
+                modes = theme_modes(name)
+                index[name] = ThemeInfo(
+                    name=name,
+                    path=path,
+                    light=modes["light"],
+                    dark=modes["dark"],
+                    color_count=pack.color_count(name),
+                    content_hash=hashlib.sha1(pack.record(name)).hexdigest(),
+                    stat=file_stat,
+                )
+        return index
+
+    def _index_file(self, name: str, path: str, file_stat: List[int]) -> ThemeInfo:
+        data = Path(path).read_bytes()
+        try:
+            theme = json.loads(data)
+            color_count = len(theme["colors"])
+            # The file was parsed anyway
+            self._remember(name, theme)
+        except (ValueError, KeyError, TypeError):
+            # Still list it. Applying it will show the error.
+            color_count = 0
+        modes = theme_modes(name)
+        return ThemeInfo(
+            name=name,
+            path=path,
+            light=modes["light"],
+            dark=modes["dark"],
+            color_count=color_count,
+            content_hash=hashlib.sha1(data).hexdigest(),
+            stat=file_stat,
+        )
+
+
+catalog = ThemeCatalog(THEMES_DIR, USER_FILES_DIR / "themes_index.json")
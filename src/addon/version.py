@@ -0,0 +1,2 @@
+# Written by release/new_version.py
+VERSION = "3.3"
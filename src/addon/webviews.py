@@ -0,0 +1,74 @@
+from typing import Callable, Iterator
+import weakref
+
+from aqt.qt import QEvent, QObject, sip
+from aqt.webview import AnkiWebView
+
+from . import diagnostics
+
+
+class WebviewRegistry(QObject):
+    """Weakly tracks the live webviews.
+
+    Updates are only sent to visible webviews. Hidden ones are marked stale,
+    and `catch_up` is called for them when they are shown again.
+    Only stale webviews have the registry as their event filter, to catch the Show event.
+    Python event filters run for every event of the object, and up to date webviews
+    get far more events (paints, input) than hidden ones.
+    """
+
+    def __init__(self, catch_up: Callable[[AnkiWebView], None]) -> None:
+        QObject.__init__(self)
+        self.catch_up = catch_up
+        # webview -> is stale
+        self._webviews: "weakref.WeakKeyDictionary[AnkiWebView, bool]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def add(self, webview: AnkiWebView) -> None:
+        if webview in self._webviews:
+            return
+        self._webviews[webview] = False
+
+    def discard(self, webview: AnkiWebView) -> None:
+        if self._webviews.pop(webview, False) and not sip.isdeleted(webview):
+            webview.removeEventFilter(self)
+
+    def __iter__(self) -> Iterator[AnkiWebView]:
+        "Iterates over webviews whose Qt object still exists"
+        for webview in list(self._webviews.keys()):
+            if sip.isdeleted(webview):
+                del self._webviews[webview]
+            else:
+                yield webview
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def visible(self) -> Iterator[AnkiWebView]:
+        "Iterates over visible webviews, marking the hidden ones stale"
+        for webview in self:
+            if webview.isVisible():
+                yield webview
+            elif not self._webviews[webview]:
+                self._webviews[webview] = True
+                webview.installEventFilter(self)
+
+    def broadcast(self, js: str) -> None:
+        with diagnostics.stage("webview eval") as stage:
+            count = 0
+            for webview in self.visible():
+                webview.eval(js)
+                count += 1
+            stage.note(webviews=count, js_bytes=len(js))
+
+    def is_stale(self, webview: AnkiWebView) -> bool:
+        return self._webviews.get(webview, False)
+
+    def eventFilter(self, obj: QObject, event: QEvent) -> bool:
+        if event.type() == QEvent.Type.Show and self._webviews.get(obj):  # type: ignore
+            self._webviews[obj] = False  # type: ignore
+            # Safe within eventFilter()
+            obj.removeEventFilter(self)
+            self.catch_up(obj)  # type: ignore
+        return False
@@ -0,0 +1,79 @@
+"""The tests run against the stub aqt/anki packages of the benchmarks, with Qt on the offscreen platform.
+
+Standalone modules of the add-on (rgba, ankiaddonconfig) are imported directly from src/addon.
+Tests of the rest use the `addon` fixture, which imports a copy of the add-on from a temporary addons folder,
+so config saves and migrations don't touch the repo.
+"""
+
+from pathlib import Path
+from typing import Any, Iterator
+import importlib
+import json
+import os
+import shutil
+import sys
+
+import pytest
+
+REPO_DIR = Path(__file__).resolve().parents[1]
+ADDON_SRC = REPO_DIR / "src" / "addon"
+# The add-on's package name in the temporary addons folder
+ADDON_MODULE = "recolor"
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, str(REPO_DIR / "benchmarks"))
+sys.path.insert(0, str(REPO_DIR / "benchmarks" / "stubs"))
+sys.path.insert(0, str(ADDON_SRC))
+
+
+@pytest.fixture(scope="session")
+def addons_dir(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """The stub Anki's addons folder. Set up once, as modules bind aqt.mw when they are imported.
+    Holds a copy of the add-on, and a config for the standalone ankiaddonconfig package."""
+    import aqt
+
+    addons_dir = tmp_path_factory.mktemp("addons")
+    shutil.copytree(
+        ADDON_SRC,
+        addons_dir / ADDON_MODULE,
+        ignore=shutil.ignore_patterns("__pycache__", "user_files", "meta.json"),
+    )
+    # ConfigManager reads the config of the add-on its package is in
+    (addons_dir / "ankiaddonconfig").mkdir()
+    (addons_dir / "ankiaddonconfig" / "config.json").write_text(
+        json.dumps({"a": 1, "b": [1, 2]})
+    )
+    aqt.setup(addons_dir)
+    sys.path.append(str(addons_dir))
+    return addons_dir
+
+
+@pytest.fixture(scope="session")
+def addon(addons_dir: Path) -> Any:
+    return importlib.import_module(ADDON_MODULE)
+
+
+def write_user_config(addons_dir: Path, module: str, config: dict) -> None:
+    "Writes meta.json like Anki does"
+    path = addons_dir / module / "meta.json"
+    path.write_text(json.dumps({"config": config}), encoding="utf8")
+
+
+@pytest.fixture
+def default_config(addon: Any, addons_dir: Path) -> Iterator[Any]:
+    "The add-on with the default config, as after its first startup. Returns its ConfigManager."
+    colors = sys.modules[f"{ADDON_MODULE}.colors"]
+    migrate = sys.modules[f"{ADDON_MODULE}.migrate"]
+    meta_path = addons_dir / ADDON_MODULE / "meta.json"
+
+    def reset() -> None:
+        meta_path.unlink(missing_ok=True)
+        addon.conf.load(force=True)
+        # As on startup
+        migrate.maybe_migrate_config(addon.conf)
+        colors.invalidate_compiled_theme()
+        colors.recolor_python()
+
+    reset()
+    yield addon.conf
+    reset()
@@ -0,0 +1,95 @@
+"""diff_payload() turns a page colored with one compiled theme into another."""
+
+from typing import Any, Dict
+import copy
+import importlib
+import json
+
+import pytest
+
+from conftest import ADDON_MODULE
+
+
+@pytest.fixture
+def compiler(addon: Any) -> Any:
+    return importlib.import_module(f"{ADDON_MODULE}.compiler")
+
+
+@pytest.fixture
+def colors(addon: Any) -> Dict[str, Any]:
+    return addon.conf.get_default_copy("colors")
+
+
+def diff(compiler: Any, old: Dict[str, Any], new: Dict[str, Any]) -> Any:
+    payload = compiler.diff_payload(compiler.compile_theme(old), compiler.compile_theme(new))
+    return None if payload is None else json.loads(payload)
+
+
+def test_first_page_gets_the_full_payload(compiler: Any, colors: Dict[str, Any]) -> None:
+    theme = compiler.compile_theme(colors)
+    assert compiler.diff_payload(None, theme) == theme.js_payload
+    assert json.loads(theme.js_payload)["light"]["--canvas"] == colors["CANVAS"][1]
+
+
+def test_unchanged_theme_has_no_payload(compiler: Any, colors: Dict[str, Any]) -> None:
+    assert compiler.diff_payload(compiler.compile_theme(colors), compiler.compile_theme(colors)) is None
+    assert diff(compiler, colors, copy.deepcopy(colors)) is None
+
+
+def test_changed_variables(compiler: Any, colors: Dict[str, Any]) -> None:
+    new = copy.deepcopy(colors)
+    new["FG_LINK"][1] = "#010203"
+    new["FG_LINK"][2] = "#040506"
+    assert diff(compiler, colors, new) == {
+        "light": {"--fg-link": "#010203"},
+        "dark": {"--fg-link": "#040506"},
+    }
+
+
+def test_added_and_removed_variables(compiler: Any, colors: Dict[str, Any]) -> None:
+    new = copy.deepcopy(colors)
+    del new["FG_LINK"]
+    new["NEW_COLOR"] = ["New color", "#111111", "#222222", ["--new-a", "--new-b"]]
+    assert diff(compiler, colors, new) == {
+        "light": {"--fg-link": None, "--new-a": "#111111", "--new-b": "#111111"},
+        "dark": {"--fg-link": None, "--new-a": "#222222", "--new-b": "#222222"},
+    }
+
+
+def test_renamed_css_variable(compiler: Any, colors: Dict[str, Any]) -> None:
+    new = copy.deepcopy(colors)
+    new["FG_LINK"][3] = "--link"
+    light, dark = colors["FG_LINK"][1:3]
+    assert diff(compiler, colors, new) == {
+        "light": {"--fg-link": None, "--link": light},
+        "dark": {"--fg-link": None, "--link": dark},
+    }
+
+
+def test_mode_switch_only_sends_the_changed_mode(compiler: Any, colors: Dict[str, Any]) -> None:
+    # A page switching to dark mode only needs the dark colors that differ
+    new = copy.deepcopy(colors)
+    new["STATE_NEW"][2] = "#abcdef"
+    assert diff(compiler, colors, new) == {"dark": {"--state-new": "#abcdef"}}
+    # Swapping light and dark changes both
+    swapped = copy.deepcopy(colors)
+    swapped["STATE_NEW"][1:3] = colors["STATE_NEW"][2:0:-1]
+    assert diff(compiler, colors, swapped) == {
+        "light": {"--state-new": colors["STATE_NEW"][2]},
+        "dark": {"--state-new": colors["STATE_NEW"][1]},
+    }
+
+
+def test_extra_css_is_sent_whole(compiler: Any, colors: Dict[str, Any]) -> None:
+    new = copy.deepcopy(colors)
+    new["BUTTON_BG"][2] = "#123123"
+    payload = diff(compiler, colors, new)
+    assert payload["dark"] == {"--button-bg": "#123123"}
+    assert payload["extra"] == compiler.compile_extra_css(new)
+    assert "#123123" in payload["extra"]
+
+
+def test_reordered_config_has_no_payload(compiler: Any, colors: Dict[str, Any]) -> None:
+    reordered = dict(reversed(list(colors.items())))
+    assert compiler.compile_theme(reordered).config_hash == compiler.compile_theme(colors).config_hash
+    assert diff(compiler, colors, reordered) is None
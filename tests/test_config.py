@@ -0,0 +1,56 @@
+"""The config window's actions on the add-on's config."""
+
+from pathlib import Path
+from typing import Any
+import importlib
+import json
+
+from conftest import ADDON_MODULE
+
+
+def test_applied_theme_survives_page_render_until_saved(
+    default_config: Any, addons_dir: Path
+) -> None:
+    config = importlib.import_module(f"{ADDON_MODULE}.config")
+    colors = importlib.import_module(f"{ADDON_MODULE}.colors")
+    from aqt.webview import AnkiWebView, WebContent
+
+    conf = default_config
+    saved_canvas = conf["colors.CANVAS"][1:3]
+    window = conf.build_config_window()
+    config.apply_theme(window, "Nord")
+    theme_canvas = config.themes.catalog.load("Nord")["colors"]["CANVAS"][1:3]
+    assert theme_canvas != saved_canvas
+    assert conf["colors.CANVAS"][1:3] == theme_canvas
+    assert conf.dirty
+
+    # Pages rendered before saving keep the saved colors, and leave the unsaved ones alone
+    colors.inject_web(WebContent(), None)
+    webview = AnkiWebView()
+    colors.inject_web_ts(webview)
+    colors.update_webview_css(webview)
+    webview.cleanup()
+    assert conf.dirty
+    assert conf["colors.CANVAS"][1:3] == theme_canvas
+    assert colors.compiled_theme().light_vars["--canvas"] == saved_canvas[0]
+
+    window.on_save()
+    meta = json.loads((addons_dir / ADDON_MODULE / "meta.json").read_text())
+    assert meta["config"]["colors"]["CANVAS"][1:3] == theme_canvas
+    assert colors.compiled_theme().light_vars["--canvas"] == theme_canvas[0]
+    assert colors.compiled_theme().dark_vars["--canvas"] == theme_canvas[1]
+
+
+def test_closed_diagnostics_windows_are_deleted(default_config: Any) -> None:
+    config = importlib.import_module(f"{ADDON_MODULE}.config")
+    from aqt.qt import QApplication, QDialog, QEvent, sip
+
+    window = default_config.build_config_window()
+    for _ in range(3):
+        config.diagnostics_window(window)
+        dialog = window.findChildren(QDialog)[-1]
+        assert dialog.windowTitle() == "ReColor Diagnostics"
+        dialog.close()
+        QApplication.sendPostedEvents(None, QEvent.Type.DeferredDelete)
+        assert sip.isdeleted(dialog)
+    assert window.findChildren(QDialog) == []
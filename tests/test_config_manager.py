@@ -0,0 +1,129 @@
+"""ConfigManager.load() only reads the config again when it may have changed."""
+
+from pathlib import Path
+from typing import Any, Iterator
+import os
+
+import pytest
+
+from conftest import ADDON_MODULE, write_user_config
+
+
+@pytest.fixture
+def conf(addons_dir: Path) -> Iterator[Any]:
+    from ankiaddonconfig import ConfigManager
+
+    meta_path = addons_dir / "ankiaddonconfig" / "meta.json"
+    meta_path.unlink(missing_ok=True)
+    yield ConfigManager()
+    meta_path.unlink(missing_ok=True)
+
+
+@pytest.fixture
+def reads(conf: Any, monkeypatch: pytest.MonkeyPatch) -> list:
+    "Module names getConfig() was called with"
+    import aqt
+
+    calls: list = []
+    get_config = aqt.mw.addonManager.getConfig
+
+    def counting_get_config(module: str) -> Any:
+        calls.append(module)
+        return get_config(module)
+
+    monkeypatch.setattr(aqt.mw.addonManager, "getConfig", counting_get_config)
+    return calls
+
+
+def test_unchanged_files_skip_the_read(conf: Any, reads: list) -> None:
+    conf.load()
+    conf.load()
+    assert reads == []
+    assert conf["a"] == 1
+
+
+def test_dirty_config_reloads(conf: Any, reads: list) -> None:
+    conf.set("a", 2)
+    assert conf.dirty
+    conf.load()
+    assert reads == ["ankiaddonconfig"]
+    assert conf["a"] == 1
+    assert not conf.dirty
+    conf.load()
+    assert len(reads) == 1
+
+
+def test_changed_file_reloads(conf: Any, reads: list, addons_dir: Path) -> None:
+    write_user_config(addons_dir, "ankiaddonconfig", {"a": 3})
+    conf.load()
+    assert reads == ["ankiaddonconfig"]
+    assert conf["a"] == 3
+    # Different size, so the change is seen even if the mtime didn't tick
+    write_user_config(addons_dir, "ankiaddonconfig", {"a": 40})
+    conf.load()
+    assert len(reads) == 2
+    assert conf["a"] == 40
+
+
+def test_own_save_doesnt_reload(conf: Any, reads: list) -> None:
+    conf.set("a", 5)
+    conf.save()
+    conf.load()
+    assert reads == []
+    assert conf["a"] == 5
+
+
+def test_force_reloads(conf: Any, reads: list) -> None:
+    conf.load(force=True)
+    assert reads == ["ankiaddonconfig"]
+    conf.load(force=True)
+    assert len(reads) == 2
+
+
+def rewrite_keeping_stat(path: Path, text: str) -> None:
+    "Rewrites the file in place, leaving size, inode and mtime as they were, like a write within the mtime granularity"
+    stat = path.stat()
+    assert len(text.encode()) == stat.st_size
+    with open(path, "r+", encoding="utf8") as f:
+        f.write(text)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+
+def test_same_size_rewrite_needs_force(conf: Any, addons_dir: Path) -> None:
+    write_user_config(addons_dir, "ankiaddonconfig", {"a": 3})
+    conf.load()
+    meta_path = addons_dir / "ankiaddonconfig" / "meta.json"
+    rewrite_keeping_stat(meta_path, meta_path.read_text().replace("3", "4"))
+    conf.load()
+    assert conf["a"] == 3
+    conf.load(force=True)
+    assert conf["a"] == 4
+
+
+def test_advanced_editor_same_size_rewrite_is_shown(
+    default_config: Any, addons_dir: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    import aqt
+
+    conf = default_config
+    # Written the way the editor writes it, so the rewrite below has the same size
+    aqt.mw.addonManager.writeConfig(conf.addon_dir, conf.copy())
+    conf.load(force=True)
+    window = conf.build_config_window()
+    editor = window.advanced_window()
+    old_canvas = conf["colors.CANVAS.1"]
+    new_canvas = "#123456"
+    assert len(new_canvas) == len(old_canvas)
+    editor.text = editor.text.replace(f'"{old_canvas}"', f'"{new_canvas}"', 1)
+    meta_path = addons_dir / ADDON_MODULE / "meta.json"
+    stat = meta_path.stat()
+    write_addon_meta = aqt.mw.addonManager.writeAddonMeta
+
+    def write_in_place(module: str, meta: dict) -> None:
+        write_addon_meta(module, meta)
+        os.utime(meta_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    monkeypatch.setattr(aqt.mw.addonManager, "writeAddonMeta", write_in_place)
+    editor.accept()
+    assert meta_path.stat().st_size == stat.st_size
+    assert conf["colors.CANVAS.1"] == new_canvas
@@ -0,0 +1,183 @@
+"""Config migrations on startup, from the configs older versions of the add-on saved."""
+
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+import copy
+import importlib
+import json
+
+import pytest
+
+from conftest import ADDON_MODULE, write_user_config
+
+
+@pytest.fixture
+def migrate(addon: Any) -> Any:
+    return importlib.import_module(f"{ADDON_MODULE}.migrate")
+
+
+@pytest.fixture
+def user_files(addons_dir: Path) -> Iterator[Path]:
+    path = addons_dir / ADDON_MODULE / "user_files"
+    yield path
+    (path / "v1_config.json").unlink(missing_ok=True)
+
+
+@pytest.fixture
+def saves(default_config: Any, monkeypatch: pytest.MonkeyPatch) -> List[Dict[str, Any]]:
+    "The config at each conf.save()"
+    conf = default_config
+    saved: List[Dict[str, Any]] = []
+    save = conf.save
+
+    def counted_save(force: bool = False) -> None:
+        saved.append(conf.copy())
+        save(force)
+
+    monkeypatch.setattr(conf, "save", counted_save)
+    return saved
+
+
+@pytest.fixture
+def notices(migrate: Any, monkeypatch: pytest.MonkeyPatch) -> List[str]:
+    shown: List[str] = []
+    monkeypatch.setattr(migrate, "showInfo", lambda text, **kwargs: shown.append(text))
+    return shown
+
+
+def v2_colors(conf: Any) -> Dict[str, Any]:
+    "The default colors as v2 saved them, before CANVAS_GLASS and the bootstrap css names"
+    colors = conf.get_default_copy("colors")
+    del colors["CANVAS_GLASS"]
+    colors["CANVAS"][3] = "--canvas"
+    colors["FG"][3] = "--fg"
+    return colors
+
+
+def start_with(addons_dir: Path, conf: Any, config: Dict[str, Any]) -> None:
+    write_user_config(addons_dir, ADDON_MODULE, config)
+    conf.load(force=True)
+
+
+def saved_config(addons_dir: Path) -> Dict[str, Any]:
+    meta = json.loads((addons_dir / ADDON_MODULE / "meta.json").read_text(encoding="utf8"))
+    return meta["config"]
+
+
+def assert_v3_colors(migrate: Any, colors: Dict[str, Any]) -> None:
+    elevated = colors["CANVAS_ELEVATED"]
+    assert colors["CANVAS_GLASS"][1:] == [
+        migrate.adjust_alpha(elevated[1], 0.4),
+        migrate.adjust_alpha(elevated[2], 0.4),
+        "--canvas-glass",
+    ]
+    assert colors["CANVAS"][3] == ["--canvas", "--bs-body-bg"]
+    assert colors["FG"][3] == ["--fg", "--bs-body-color"]
+
+
+def test_v1_to_v3(
+    migrate: Any,
+    addons_dir: Path,
+    default_config: Any,
+    saves: List[Dict[str, Any]],
+    notices: List[str],
+    user_files: Path,
+) -> None:
+    conf = default_config
+    v1_path = addons_dir / ADDON_MODULE / "v1_anki_config.json"
+    v1_colors = json.loads(v1_path.read_text())["colors"]
+    v1_colors["WINDOW_BG"][1] = "#123456"
+    v1_colors["LINK"][2] = "#abcdef"
+    v1_config = {"colors": v1_colors, "version": {"major": 1, "minor": 5}}
+    start_with(addons_dir, conf, v1_config)
+    before = conf.copy()
+
+    migrate.maybe_migrate_config(conf)
+
+    assert len(saves) == 1
+    assert saved_config(addons_dir) == saves[0] == conf.copy()
+    assert json.loads((user_files / "v1_config.json").read_text()) == before
+    colors = conf["colors"]
+    assert colors["CANVAS"][1] == "#123456"
+    assert colors["FG_LINK"][2] == "#abcdef"
+    assert "WINDOW_BG" not in colors
+    assert_v3_colors(migrate, conf.get_copy("colors"))
+    assert migrate.config_version(conf) == migrate.current_version()
+    assert len(notices) == 1 and "v1_config.json" in notices[0]
+
+
+@pytest.mark.parametrize("version", [(2, 1), (-1, -1)], ids=["v2", "v2 saved as -1.-1"])
+def test_v2_to_v3(
+    migrate: Any,
+    addons_dir: Path,
+    default_config: Any,
+    saves: List[Dict[str, Any]],
+    notices: List[str],
+    user_files: Path,
+    version: Any,
+) -> None:
+    conf = default_config
+    colors = v2_colors(conf)
+    colors["CANVAS_ELEVATED"][1:3] = ["#102030", "#405060cc"]
+    start_with(
+        addons_dir,
+        conf,
+        {"colors": colors, "version": {"major": version[0], "minor": version[1]}},
+    )
+    assert migrate.detect_v2(conf.copy())
+
+    migrate.maybe_migrate_config(conf)
+
+    assert len(saves) == 1
+    assert saved_config(addons_dir) == saves[0] == conf.copy()
+    # Only v1 configs are backed up
+    assert not (user_files / "v1_config.json").exists()
+    assert_v3_colors(migrate, conf.get_copy("colors"))
+    assert conf["colors.CANVAS_GLASS"][1:3] == ["#10203066", "#40506051"]
+    assert migrate.config_version(conf) == migrate.current_version()
+    assert notices == []
+
+
+def test_fresh_install_is_not_written(
+    migrate: Any,
+    addons_dir: Path,
+    default_config: Any,
+    saves: List[Dict[str, Any]],
+    user_files: Path,
+) -> None:
+    conf = default_config
+    meta_path = addons_dir / ADDON_MODULE / "meta.json"
+    assert not meta_path.exists()
+    assert migrate.config_version(conf) == (-1, -1)
+    assert not migrate.detect_v2(conf.copy())
+    before = conf.copy()
+
+    migrate.maybe_migrate_config(conf)
+
+    assert saves == []
+    assert not conf.dirty
+    assert conf.copy() == before
+    assert not meta_path.exists()
+    assert not (user_files / "v1_config.json").exists()
+
+
+def test_migration_steps_run_in_version_order(migrate: Any, default_config: Any) -> None:
+    config = {"colors": v2_colors(default_config)}
+    assert migrate.pending_migrations((1, 0), copy.deepcopy(config)) == migrate.MIGRATIONS
+    assert [m.step for m in migrate.pending_migrations((2, 0), config)] == [
+        migrate.adjust_colors_v3
+    ]
+    assert migrate.pending_migrations((3, 0), config) == []
+
+
+def test_adjust_alpha(migrate: Any) -> None:
+    # Always lowercase #rrggbbaa
+    assert migrate.adjust_alpha("#AABBCC", 0.4) == "#aabbcc66"
+    assert migrate.adjust_alpha("#abc", 0.4) == "#aabbcc66"
+    assert migrate.adjust_alpha("white", 0.4) == "#ffffff66"
+    assert migrate.adjust_alpha("transparent", 0.4) == "#00000000"
+    # The existing alpha is scaled. Before, 9 character colors came out as 10 characters, "#aabbcc833".
+    assert migrate.adjust_alpha("#aabbcc80", 0.4) == "#aabbcc33"
+    assert migrate.adjust_alpha("#AABBCCFF", 0.4) == "#aabbcc66"
+    # Other keywords are left as they are
+    assert migrate.adjust_alpha("red", 0.4) == "red"
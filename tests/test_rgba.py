@@ -0,0 +1,122 @@
+"""rgba.py against the conversions colors.py used before it existed."""
+
+from pathlib import Path
+import random
+
+import pytest
+
+# The conversions as they were before rgba.py
+from legacy import hex_with_alpha_to_argb, hex_with_alpha_to_rgba
+import rgba
+
+
+def expand(short_hex: str) -> str:
+    "#RGB(A) to #RRGGBB(AA)"
+    return "#" + "".join(c * 2 for c in short_hex[1:])
+
+
+def random_hex(rand: random.Random, digits: int) -> str:
+    value = "".join(rand.choice("0123456789abcdefABCDEF") for _ in range(digits))
+    return "#" + value
+
+
+def random_rgba(rand: random.Random) -> str:
+    r, g, b = (rand.randrange(256) for _ in range(3))
+    alpha = rand.choice(["0.5", "0.25", "0.75", "0.0", "1.0", "0.33", str(rand.randrange(1, 100) / 100)])
+    return f"rgba({r}, {g}, {b}, {alpha})"
+
+
+SAMPLES = 20000
+
+
+@pytest.mark.parametrize("digits", [6, 8])
+def test_long_hex_matches_old_conversions(digits: int) -> None:
+    rand = random.Random(digits)
+    for _ in range(SAMPLES):
+        color = random_hex(rand, digits)
+        assert rgba.to_css_rgba(color) == hex_with_alpha_to_rgba(color)
+        assert rgba.to_qt_argb(color).lower() == hex_with_alpha_to_argb(color).lower()
+
+
+def test_opaque_rrggbbaa_keeps_alpha_last() -> None:
+    # Qt would read "#112233ff" as alpha 0x11
+    assert rgba.to_qt_argb("#112233ff") == "#ff112233"
+    assert rgba.to_css_rgba("#112233ff") == "rgba(17, 34, 51, 1.0)"
+    for color in ("#000000ff", "#FFFFFFFF", "#abcdefff"):
+        assert rgba.to_qt_argb(color).lower() == hex_with_alpha_to_argb(color).lower()
+        assert rgba.to_css_rgba(color) == hex_with_alpha_to_rgba(color)
+
+
+@pytest.mark.parametrize("digits", [3, 4])
+def test_short_hex_converts_like_its_long_form(digits: int) -> None:
+    # The old conversions left #RGB and #RGBA unchanged, and QColor can't read #RGBA
+    rand = random.Random(digits)
+    for _ in range(SAMPLES):
+        color = random_hex(rand, digits)
+        long_form = expand(color)
+        if digits == 3:
+            assert rgba.to_css_rgba(color) == color
+            assert rgba.to_qt_argb(color) == color
+        else:
+            assert rgba.to_css_rgba(color) == hex_with_alpha_to_rgba(long_form)
+            assert rgba.to_qt_argb(color).lower() == hex_with_alpha_to_argb(long_form).lower()
+
+
+def test_rgba_function_matches_old_argb() -> None:
+    rand = random.Random(0)
+    for _ in range(SAMPLES):
+        color = random_rgba(rand)
+        assert rgba.to_qt_argb(color) == hex_with_alpha_to_argb(color)
+        # Qt stylesheets read rgba() as is
+        assert rgba.to_css_rgba(color) == color == hex_with_alpha_to_rgba(color)
+
+
+def test_colors_the_old_regex_skipped_become_argb() -> None:
+    # rgb() and rgba() with an integer alpha were passed to QColor unchanged, which can't read them
+    assert rgba.to_qt_argb("rgba(1, 2, 3, 1)") == "#ff010203"
+    assert rgba.to_qt_argb("rgb(1, 2, 3)") == "#ff010203"
+
+
+@pytest.mark.parametrize("color", ["white", "black", "transparent", "red", "", "#12345", "#ggg"])
+def test_names_and_invalid_colors_are_unchanged(color: str) -> None:
+    assert rgba.to_css_rgba(color) == hex_with_alpha_to_rgba(color)
+    assert rgba.to_qt_argb(color) == color
+
+
+def test_every_default_config_color_matches_old_conversions() -> None:
+    import json
+    from conftest import ADDON_SRC
+
+    config = json.loads((ADDON_SRC / "config.json").read_text(encoding="utf8"))
+    for entry in config["colors"].values():
+        for color in entry[1:3]:
+            expected_css = hex_with_alpha_to_rgba(color)
+            if color.startswith("#") and len(color) == 5:
+                expected_css = hex_with_alpha_to_rgba(expand(color))
+            assert rgba.to_css_rgba(color) == expected_css
+
+
+@pytest.mark.parametrize(
+    "color, argb",
+    [
+        ("#112233", "#ff112233"),
+        ("#abc", "#ffaabbcc"),
+        ("#11223380", "#80112233"),
+        ("#abc8", "#88aabbcc"),
+        ("rgba(17, 34, 51, 0.5)", "#7f112233"),
+        ("white", "#ffffffff"),
+    ],
+)
+def test_str_to_qcolor(addons_dir: Path, color: str, argb: str) -> None:
+    # addons_dir sets up the stub Anki before ankiaddonconfig is imported
+    from aqt.qt import QColor
+    from ankiaddonconfig.window import str_to_qcolor
+
+    assert str_to_qcolor(color).name(QColor.NameFormat.HexArgb) == argb
+
+
+@pytest.mark.parametrize("color", ["", "#12345", "#1122334", "nocolor", "rgba(1, 2)"])
+def test_str_to_qcolor_invalid(addons_dir: Path, color: str) -> None:
+    from ankiaddonconfig.window import str_to_qcolor
+
+    assert not str_to_qcolor(color).isValid()
@@ -0,0 +1,126 @@
+"""Theme packs, written by release/theme_pack.py and read by the add-on's ThemeCatalog."""
+
+from pathlib import Path
+from typing import Any
+import importlib
+import json
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ADDON_MODULE, ADDON_SRC, REPO_DIR
+import rgba
+
+
+@pytest.fixture
+def themepack(addon: Any) -> Any:
+    return importlib.import_module(f"{ADDON_MODULE}.themepack")
+
+
+@pytest.fixture
+def pack_path(themepack: Any, tmp_path: Path) -> Path:
+    path = tmp_path / f"themes{themepack.PACK_SUFFIX}"
+    themepack.pack_json_themes(ADDON_SRC / "themes", path)
+    return path
+
+
+def run_theme_pack(*args: Any) -> str:
+    result = subprocess.run(
+        [sys.executable, str(REPO_DIR / "release" / "theme_pack.py"), *map(str, args)],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return result.stdout
+
+
+def assert_same_theme(unpacked: dict, theme: dict) -> None:
+    "Packed colors come back as lowercase hex, e.g. white as #ffffff"
+    assert {k: v for k, v in unpacked.items() if k != "colors"} == {
+        k: v for k, v in theme.items() if k != "colors"
+    }
+    assert list(unpacked["colors"]) == sorted(theme["colors"])
+    for key, entry in theme["colors"].items():
+        unpacked_entry = unpacked["colors"][key]
+        if unpacked_entry == entry:
+            continue
+        assert unpacked_entry[0] == entry[0] and unpacked_entry[3] == entry[3], key
+        for i in (1, 2):
+            assert unpacked_entry[i] == rgba.to_hex(rgba.parse(entry[i])), key
+
+
+def test_round_trip(tmp_path: Path) -> None:
+    json_themes = sorted((ADDON_SRC / "themes").glob("*.json"))
+    pack_path = tmp_path / "themes.rctp"
+    out_dir = tmp_path / "out"
+    assert run_theme_pack("pack", ADDON_SRC / "themes", pack_path) == f"packed {len(json_themes)} themes\n"
+    assert run_theme_pack("unpack", pack_path, out_dir) == f"unpacked {len(json_themes)} themes\n"
+
+    assert sorted(p.name for p in out_dir.iterdir()) == [p.name for p in json_themes]
+    for theme_path in json_themes:
+        theme = json.loads(theme_path.read_text(encoding="utf-8"))
+        unpacked = json.loads((out_dir / theme_path.name).read_text(encoding="utf-8"))
+        assert_same_theme(unpacked, theme)
+
+
+def test_catalog_reads_pack_and_closes_it(
+    themepack: Any, pack_path: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    themes = importlib.import_module(f"{ADDON_MODULE}.themes")
+    opened = []
+
+    class TrackedThemePack(themepack.ThemePack):
+        def __init__(self, path: Path) -> None:
+            super().__init__(path)
+            opened.append(self)
+
+    monkeypatch.setattr(themes, "ThemePack", TrackedThemePack)
+    catalog = themes.ThemeCatalog(pack_path.parent, tmp_path / "user_files" / "themes_index.json")
+    assert catalog.names() == sorted(p.stem for p in (ADDON_SRC / "themes").glob("*.json"))
+    nord = json.loads((ADDON_SRC / "themes" / "Nord.json").read_text(encoding="utf-8"))
+    assert_same_theme(catalog.load("Nord"), nord)
+    assert catalog.info("Nord").color_count == len(nord["colors"])
+    # An open memory map would lock the pack on Windows, and block add-on updates
+    assert len(opened) == 2
+    assert all(pack._mmap.closed for pack in opened)
+
+
+def test_bad_magic(themepack: Any, pack_path: Path) -> None:
+    data = bytearray(pack_path.read_bytes())
+    data[:4] = b"JSON"
+    pack_path.write_bytes(data)
+    with pytest.raises(themepack.ThemePackError, match="not a theme pack"):
+        themepack.ThemePack(pack_path)
+
+
+def test_truncated_header(themepack: Any, pack_path: Path) -> None:
+    data = pack_path.read_bytes()
+    pack_path.write_bytes(data[: themepack.PREAMBLE.size + 10])
+    with pytest.raises(themepack.ThemePackError, match="Invalid theme pack"):
+        themepack.ThemePack(pack_path)
+    # Not even the preamble
+    pack_path.write_bytes(data[:6])
+    with pytest.raises(themepack.ThemePackError, match="Invalid theme pack"):
+        themepack.ThemePack(pack_path)
+    pack_path.write_bytes(b"")
+    with pytest.raises(themepack.ThemePackError, match="Invalid theme pack"):
+        themepack.ThemePack(pack_path)
+
+
+def test_out_of_range_offset(themepack: Any, pack_path: Path) -> None:
+    data = pack_path.read_bytes()
+    with themepack.ThemePack(pack_path) as pack:
+        name = pack.names()[-1]
+        offset, length = pack.index[name]
+    # Records are written in order, so cutting the last one leaves the header valid
+    pack_path.write_bytes(data[: offset + length - 1])
+    with pytest.raises(themepack.ThemePackError, match="Truncated theme pack"):
+        themepack.ThemePack(pack_path)
+
+
+def test_catalog_skips_invalid_pack(addon: Any, pack_path: Path, tmp_path: Path) -> None:
+    themes = importlib.import_module(f"{ADDON_MODULE}.themes")
+    pack_path.write_bytes(b"RCTP")
+    catalog = themes.ThemeCatalog(pack_path.parent, tmp_path / "user_files" / "themes_index.json")
+    assert catalog.names() == []
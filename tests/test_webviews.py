@@ -0,0 +1,82 @@
+"""WebviewRegistry catches up hidden webviews when they are shown, without filtering the events of the others."""
+
+from typing import Any, Iterator, List
+import importlib
+
+import pytest
+
+from conftest import ADDON_MODULE
+
+
+@pytest.fixture
+def registry(addon: Any) -> Any:
+    from aqt.qt import QEvent, QObject
+
+    webviews = importlib.import_module(f"{ADDON_MODULE}.webviews")
+    WebviewRegistry: Any = webviews.WebviewRegistry
+
+    class CountingRegistry(WebviewRegistry):
+        "Counts the events its event filter sees"
+
+        def __init__(self) -> None:
+            self.caught_up: List[Any] = []
+            self.filtered = 0
+            WebviewRegistry.__init__(self, self.caught_up.append)
+
+        def eventFilter(self, obj: QObject, event: QEvent) -> bool:
+            self.filtered += 1
+            return WebviewRegistry.eventFilter(self, obj, event)
+
+    return CountingRegistry()
+
+
+@pytest.fixture
+def webview(addon: Any) -> Iterator[Any]:
+    from aqt.qt import sip
+    from aqt.webview import AnkiWebView
+
+    webview = AnkiWebView()
+    yield webview
+    webview.cleanup()
+    sip.delete(webview)
+
+
+def test_visible_webview_is_not_filtered(registry: Any, webview: Any) -> None:
+    registry.add(webview)
+    webview.show()
+    registry.broadcast("update()")
+    assert webview.evals == 1
+    assert not registry.is_stale(webview)
+    webview.resize(300, 200)
+    webview.hide()
+    webview.show()
+    assert registry.filtered == 0
+    assert registry.caught_up == []
+
+
+def test_hidden_webview_catches_up_once_shown(registry: Any, webview: Any) -> None:
+    registry.add(webview)
+    registry.broadcast("update()")
+    registry.broadcast("update()")
+    assert webview.evals == 0
+    assert registry.is_stale(webview)
+    webview.show()
+    assert registry.caught_up == [webview]
+    assert not registry.is_stale(webview)
+    # Up to date again, so the filter is gone
+    filtered = registry.filtered
+    webview.hide()
+    webview.show()
+    webview.resize(300, 200)
+    assert registry.filtered == filtered
+    assert registry.caught_up == [webview]
+
+
+def test_discarded_webview_is_not_caught_up(registry: Any, webview: Any) -> None:
+    registry.add(webview)
+    registry.broadcast("update()")
+    registry.discard(webview)
+    webview.show()
+    assert registry.caught_up == []
+    assert registry.filtered == 0
+    assert list(registry) == []
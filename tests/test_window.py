@@ -0,0 +1,81 @@
+"""The config window only refreshes the widgets of the config keys that changed."""
+
+from pathlib import Path
+from typing import Any, Callable, Iterator, List
+
+import pytest
+
+
+@pytest.fixture
+def window(addons_dir: Path) -> Iterator[Any]:
+    from ankiaddonconfig import ConfigManager
+
+    window = ConfigManager().build_config_window()
+    yield window
+    window.deleteLater()
+
+
+def subscribe(window: Any, *keys: str) -> List[Callable[[], None]]:
+    "One widget update per key, named after it"
+    updates = []
+    for key in keys:
+
+        def update() -> None:
+            pass
+
+        update.__name__ = key
+        window.subscribe(key, update)
+        updates.append(update)
+    return updates
+
+
+def updated_keys(window: Any, changed: List[str]) -> List[str]:
+    return sorted(update.__name__ for update in window.updates_for_keys(changed))
+
+
+def test_changed_keys(addons_dir: Path) -> None:
+    from ankiaddonconfig.window import changed_keys
+
+    old = {"a": 1, "b": {"c": [1, 2], "d": "x"}, "removed": 1}
+    new = {"a": 1, "b": {"c": [1, 3], "d": "y"}, "added": 2}
+    assert sorted(changed_keys(old, new)) == ["added", "b.c.1", "b.d", "removed"]
+    assert changed_keys(old, old) == []
+
+
+def test_changed_keys_of_replaced_values(addons_dir: Path) -> None:
+    from ankiaddonconfig.window import changed_keys
+
+    # Lists of another length, and values of another type, are changed as a whole
+    assert changed_keys({"a": [1, 2]}, {"a": [1, 2, 3]}) == ["a"]
+    assert changed_keys({"a": {"b": 1}}, {"a": [1]}) == ["a"]
+    assert changed_keys({"a": 1}, {"a": "1"}) == ["a"]
+    assert changed_keys(1, 2) == [""]
+
+
+def test_updates_for_keys(window: Any) -> None:
+    subscribe(window, "colors", "colors.CANVAS", "colors.CANVAS.1", "colors.FG", "version.major")
+    # The changed key, its parents and its children
+    assert updated_keys(window, ["colors.CANVAS"]) == ["colors", "colors.CANVAS", "colors.CANVAS.1"]
+    assert updated_keys(window, ["colors.CANVAS.2"]) == ["colors", "colors.CANVAS"]
+    assert updated_keys(window, ["colors"]) == [
+        "colors",
+        "colors.CANVAS",
+        "colors.CANVAS.1",
+        "colors.FG",
+    ]
+    assert updated_keys(window, ["version.minor"]) == []
+    assert updated_keys(window, []) == []
+
+
+def test_updates_for_keys_matches_whole_levels(window: Any) -> None:
+    subscribe(window, "colors.FG", "colors.FG_LINK", "colors.FG_LINK.1")
+    # "colors.FG" is not a prefix of "colors.FG_LINK"
+    assert updated_keys(window, ["colors.FG"]) == ["colors.FG"]
+    assert updated_keys(window, ["colors.FG.1"]) == ["colors.FG"]
+    assert updated_keys(window, ["colors.FG_LINK.1"]) == ["colors.FG_LINK", "colors.FG_LINK.1"]
+
+
+def test_root_change_updates_every_widget(window: Any) -> None:
+    updates = subscribe(window, "a", "b.c")
+    assert window.updates_for_keys([""]) == updates
+    assert window.updates_for_keys(["a", ""]) == updates